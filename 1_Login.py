@@ -1,6 +1,7 @@
 import streamlit as st
-from supabase import create_client, Client
 import time
+from utils.bootstrap import get_auth_client, warm_caches
+from utils.resilience import BackendUnavailable, get_executor
 
 # --- Configuração da Página ---
 st.set_page_config(
@@ -11,27 +12,17 @@ st.set_page_config(
 )
 
 # --- Conexão com Supabase ---
-@st.cache_resource
-def init_supabase_connection():
-    try:
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        return create_client(url, key)
-    except Exception as e:
-        st.error("Erro ao conectar com o Supabase. Verifique suas credenciais em secrets.toml.")
-        st.error(e)
-        st.stop()
-
-supabase: Client = init_supabase_connection()
+warm_caches()
 
 def login_user(email, password):
     """Autentica o usuário e verifica se a conta está ativa."""
+    supabase = get_auth_client()
     try:
-        session = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        session = get_executor().call("supabase", supabase.auth.sign_in_with_password, {"email": email, "password": password})
         
         if session.user:
             user_id = session.user.id
-            user_data = supabase.table('usuarios').select("*").eq('id', user_id).single().execute()
+            user_data = get_executor().call("supabase", supabase.table('usuarios').select("*").eq('id', user_id).single().execute, idempotent=True)
 
             if user_data.data:
                 # VERIFICAÇÃO DE USUÁRIO ATIVO
@@ -50,6 +41,9 @@ def login_user(email, password):
                 supabase.auth.sign_out()
                 return False
         return False
+    except BackendUnavailable as e:
+        st.error(f"Não foi possível contatar o servidor: {e}")
+        return False
     except Exception:
         st.error("E-mail ou senha incorretos. Por favor, tente novamente.")
         return False
@@ -57,7 +51,7 @@ def login_user(email, password):
 def logout():
     """Limpa o estado da sessão para deslogar o usuário."""
     if 'user_info' in st.session_state:
-      supabase.auth.sign_out()
+      get_auth_client().auth.sign_out()
     for key in list(st.session_state.keys()):
         del st.session_state[key]
     st.rerun()
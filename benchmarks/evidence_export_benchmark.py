@@ -0,0 +1,99 @@
+"""
+Exportação de evidências (utils/evidence_export.py): downloads em sequência x em paralelo.
+
+Sobe um servidor HTTP local que serve imagens sintéticas com latência fixa por
+requisição (simulando o Storage) e exporta o mesmo conjunto de OS com 1 e com N
+downloads simultâneos. Mostra o tempo, a vazão e o pico de memória (tracemalloc) de
+cada execução e confere se o ZIP tem todos os arquivos e o manifesto.
+
+Uso (a partir da raiz do projeto):
+
+    python benchmarks/evidence_export_benchmark.py [--orders 40 --latency 0.15 --kb 400 --workers 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.evidence_export import export_evidence_zip  # noqa: E402
+
+FOTOS = ["foto_placa", "foto_chassi", "foto_medidor", "foto_instalacao"]
+ASSINATURAS = ["assinatura_tecnico", "assinatura_cliente"]
+
+
+def make_handler(latency, payload):
+    class Storage(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Storage
+
+
+def synthetic_orders(base_url, orders):
+    os_list = []
+    for i in range(orders):
+        os_id = f"{i:08d}-0000-0000-0000-000000000000"
+        os_list.append({
+            "id": os_id,
+            "veiculo_placa": f"ABC{i % 10}D{i:02d}",
+            "cliente_nome": f"Cliente {i % 3}",
+            "fotos_urls": {key: f"{base_url}/{os_id}/{key}.png" for key in FOTOS},
+            "assinaturas_urls": {key: f"{base_url}/{os_id}/{key}.png" for key in ASSINATURAS},
+        })
+    return os_list
+
+
+def run(os_list, workers):
+    fd, path = tempfile.mkstemp(suffix=".zip")
+    tracemalloc.start()
+    with os.fdopen(fd, "wb") as zip_file:
+        stats = export_evidence_zip(os_list, zip_file, max_workers=workers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+    os.remove(path)
+    return stats, peak / 1024 / 1024, names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.15, help="segundos por requisição")
+    parser.add_argument("--kb", type=int, default=400, help="tamanho de cada imagem")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, os.urandom(args.kb * 1024)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os_list = synthetic_orders(f"http://127.0.0.1:{server.server_port}", args.orders)
+    expected = args.orders * (len(FOTOS) + len(ASSINATURAS)) + 1  # + manifesto
+
+    print(f"{args.orders} OS x {len(FOTOS) + len(ASSINATURAS)} arquivos de {args.kb} KB, latência {args.latency * 1000:.0f} ms\n")
+    print(f"{'Downloads simultâneos':<24} {'Tempo (s)':>10} {'MB/s':>8} {'Pico (MB)':>10} {'Arquivos':>9}")
+    ok = True
+    for workers in (1, args.workers):
+        stats, peak_mb, names = run(os_list, workers)
+        ok &= len(names) == expected and "manifesto.csv" in names and stats["falhas"] == 0
+        print(f"{workers:<24} {stats['segundos']:>10.1f} {stats['mb_por_segundo']:>8.1f} {peak_mb:>10.1f} {len(names):>9}")
+
+    server.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark da exportação do relatório de OS finalizadas: tempo e pico de memória por formato.
+
+Cada formato roda em um processo separado, para que o pico de memória (ru_maxrss) de um
+não contamine o outro. "xlsx-pandas" é o caminho anterior (DataFrame + ExcelWriter em
+memória), para comparação com o Excel em modo write-only.
+
+Uso (a partir da raiz do projeto, apenas Linux/macOS):
+
+    python benchmarks/export_benchmark.py [--rows 100000] [--formats xlsx csv parquet xlsx-pandas]
+
+Antes das medições, confere que o Parquet aceita uma coluna nula no primeiro lote e
+preenchida nos seguintes; sai com código 1 se a verificação falhar.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from utils.checklist import encode_sparse  # noqa: E402
+
+FORMATS = ["xlsx", "csv", "parquet", "xlsx-pandas"]
+ITENS = [f"Item {i}" for i in range(120)]
+
+
+def synthetic_rows(count, seed=42):
+    """Linhas no formato retornado pelo Supabase, com checklist esparso."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        created = start + timedelta(minutes=i)
+        defeitos = {item: "" for item in rng.sample(ITENS, rng.choice([0, 0, 1, 2, 5]))}
+        yield {
+            "id": f"{i:08x}-0000-4000-8000-{rng.getrandbits(48):012x}",
+            "created_at": created.isoformat() + "+00:00",
+            "data_finalizacao": (created + timedelta(hours=rng.randint(1, 72))).isoformat() + "+00:00",
+            "status": "Finalizada",
+            "cliente_nome": f"Cliente {rng.randint(1, 5000)}",
+            "cliente_endereco": f"Rua {rng.randint(1, 900)}, {rng.randint(1, 9999)} - Porto Velho",
+            "veiculo_placa": f"ABC{rng.randint(0, 9)}D{rng.randint(0, 99):02d}",
+            "veiculo_modelo": "Modelo",
+            "veiculo_tipo": rng.choice(["carro", "moto", "caminhao"]),
+            "servico_tipo": rng.choice(["Instalação", "Manutenção", "Retirada"]),
+            "tecnico_id": f"{rng.randint(1, 30):08x}-0000-4000-8000-000000000000",
+            "tecnico_nome": f"Técnico {rng.randint(1, 30)}",
+            "rastreador_id": f"RST{rng.randint(0, 99_999_999):08d}",
+            "bloqueio_instalado": rng.random() < 0.3,
+            "observacoes": rng.choice(["", "Cliente ausente no primeiro horário.", "Sem observações"]),
+            # Só as OS mais novas têm o autor da última mudança (histórico de status)
+            "atualizado_por": None if i < count // 2 else f"{rng.randint(1, 30):08x}-0000-4000-8000-000000000000",
+            "checklist_respostas": encode_sparse(ITENS, defeitos),
+            "fotos_urls": json.dumps({"placa": "https://exemplo/placa.png"}),
+            "assinaturas_urls": json.dumps({"tecnico": "https://exemplo/tecnico.png"}),
+        }
+
+
+def _rss_mb():
+    # No Linux ru_maxrss é reportado em KB; no macOS, em bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+
+
+def run_one(fmt, rows):
+    """Executado no processo filho: gera o arquivo e imprime as métricas em JSON."""
+    from utils.export import report_row, write_export
+
+    if fmt == "xlsx-pandas":
+        import pandas as pd
+        from io import BytesIO
+    import openpyxl  # noqa: F401  (importações fora da medição)
+    import pyarrow.parquet  # noqa: F401
+
+    baseline = _rss_mb()
+    path = os.path.join(tempfile.mkdtemp(), f"relatorio.{fmt.split('-')[0]}")
+    start = time.perf_counter()
+    if fmt == "xlsx-pandas":
+        df = pd.DataFrame([report_row(row) for row in synthetic_rows(rows)])
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name="Relatorio_OS")
+        with open(path, "wb") as f:
+            f.write(output.getvalue())
+    else:
+        write_export(fmt, (report_row(row, format_dates=fmt != "parquet") for row in synthetic_rows(rows)), path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "formato": fmt,
+        "segundos": elapsed,
+        "linhas_por_segundo": rows / elapsed,
+        "pico_memoria_mb": _rss_mb() - baseline,
+        "tamanho_mb": os.path.getsize(path) / 1024 / 1024,
+    }))
+    os.remove(path)
+
+
+def check_parquet_null_then_filled():
+    """
+    Uma coluna toda nula no primeiro lote e preenchida depois precisa manter o tipo do
+    esquema (antes, o esquema vinha do primeiro lote e a gravação falhava no cast).
+    """
+    import pyarrow.parquet as pq
+
+    import utils.export as export
+
+    rows = [export.report_row(row, format_dates=False) for row in synthetic_rows(8)]
+    for index, row in enumerate(rows):
+        row["observacoes"] = None if index < 4 else f"Observação {index}"
+        row["atualizado_por"] = None if index < 4 else row["tecnico_id"]
+    path = os.path.join(tempfile.mkdtemp(), "verificacao.parquet")
+    batch, export.PARQUET_BATCH = export.PARQUET_BATCH, 3
+    try:
+        export.write_parquet(iter(rows), path)
+    finally:
+        export.PARQUET_BATCH = batch
+    table = pq.read_table(path)
+    os.remove(path)
+    passed = (
+        table.num_rows == len(rows)
+        and str(table.schema.field("observacoes").type) == "string"
+        and table.column("observacoes").to_pylist() == [row["observacoes"] for row in rows]
+        and table.column("atualizado_por").to_pylist() == [row["atualizado_por"] for row in rows]
+        and str(table.schema.field("data_finalizacao").type).startswith("timestamp")
+    )
+    print(f"[{'OK' if passed else 'FALHOU'}] Parquet: coluna nula no primeiro lote e preenchida depois\n")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--child", choices=FORMATS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(args.child, args.rows)
+        return
+
+    if not check_parquet_null_then_filled():
+        sys.exit(1)
+    print(f"Exportando {args.rows} OS sintéticas\n")
+    print(f"{'Formato':<12} {'Tempo (s)':>10} {'Linhas/s':>10} {'Pico (MB)':>10} {'Arquivo (MB)':>13}")
+    for fmt in args.formats:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", fmt, "--rows", str(args.rows)],
+            capture_output=True, text=True, check=True, cwd=ROOT
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{fmt:<12} {result['segundos']:>10.2f} {result['linhas_por_segundo']:>10.0f} "
+              f"{result['pico_memoria_mb']:>10.1f} {result['tamanho_mb']:>13.2f}")
+    print("\nPico de memória: aumento do RSS máximo do processo durante a exportação.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Injeção de falhas no executor de chamadas ao backend (utils/resilience.py).
+
+Sobe um substituto local do PostgREST (servidor HTTP nesta mesma máquina) que adiciona
+latência e erros 503 conforme o cenário, e faz leituras com o cliente Supabase real
+através do executor. Para cada cenário mostra a taxa de sucesso, as latências e quantas
+leituras vieram dos dados salvos, e confere o comportamento esperado.
+
+Uso (a partir da raiz do projeto):
+
+    python benchmarks/fault_injection.py [--calls 40]
+
+Sai com código 1 se alguma verificação falhar.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from supabase import create_client  # noqa: E402
+
+from utils.resilience import CLOSED, OPEN, BackendExecutor, BackendUnavailable, client_options  # noqa: E402
+
+# Prazos curtos para o cenário rodar em segundos; a proporção entre eles é a mesma do app
+BACKENDS = {"supabase": {"timeout": 0.5, "retries": 2, "failure_threshold": 5, "reset_timeout": 1.5}}
+ROWS = [{"id": f"tec-{i}", "nome": f"Técnico {i}"} for i in range(20)]
+
+
+class Faults:
+    """
+    Falhas aplicadas pelo substituto: fração com atraso, fração com 503 e queda total.
+    As frações são distribuídas de forma uniforme e determinística entre as requisições,
+    para que o resultado de cada cenário não dependa da sorte.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.set()
+
+    def set(self, slow=0.0, delay=0.0, errors=0.0, down=False):
+        self.slow, self.delay, self.errors, self.down = slow, delay, errors, down
+        self.requests = 0
+
+    def next(self):
+        """(atrasar, falhar) para a próxima requisição."""
+        with self._lock:
+            n = self.requests
+            self.requests += 1
+        hit = lambda fraction: int((n + 1) * fraction) > int(n * fraction)  # noqa: E731
+        return hit(self.slow), hit(self.errors)
+
+
+faults = Faults()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if faults.down:
+            time.sleep(3)  # servidor travado: conexão aberta sem resposta
+            return
+        slow, error = faults.next()
+        if slow:
+            time.sleep(faults.delay)
+        # Sem Content-Length o cliente esperaria o fim da conexão e o 503 viraria um estouro de prazo
+        body = json.dumps({"message": "Serviço indisponível", "code": "503"} if error else ROWS).encode()
+        if error:
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_calls(executor, client, calls):
+    latencies, ok, stale, failed = [], 0, 0, 0
+    for _ in range(calls):
+        before = executor.stats["dados_salvos"]
+        started = time.perf_counter()
+        try:
+            executor.read("supabase", "usuarios", lambda: client.table("usuarios").select("id, nome").execute().data)
+            if executor.stats["dados_salvos"] > before:
+                stale += 1
+            else:
+                ok += 1
+        except BackendUnavailable:
+            failed += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "ok": ok, "salvos": stale, "falhas": failed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "max_ms": latencies[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=40)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Mesmas opções do app (sem as novas tentativas internas do postgrest-py)
+    client = create_client(f"http://127.0.0.1:{server.server_port}", "chave-local", options=client_options())
+    executor = BackendExecutor(BACKENDS)
+    breaker = executor.breakers["supabase"]
+    deadline_ms = BACKENDS["supabase"]["timeout"] * 1000
+    # Pior caso de uma leitura: todas as tentativas estouram o prazo, mais as esperas entre elas
+    worst_ms = deadline_ms * (BACKENDS["supabase"]["retries"] + 1) + 2000 * BACKENDS["supabase"]["retries"]
+
+    checks = []
+
+    def check(description, passed):
+        checks.append(passed)
+        print(f"    [{'OK' if passed else 'FALHOU'}] {description}")
+
+    def scenario(title, calls=args.calls, **fault):
+        faults.set(**fault)
+        result = run_calls(executor, client, calls)
+        print(f"\n{title}")
+        print(f"    ok={result['ok']} salvos={result['salvos']} falhas={result['falhas']} "
+              f"p50={result['p50_ms']:.0f} ms p95={result['p95_ms']:.0f} ms max={result['max_ms']:.0f} ms "
+              f"disjuntor={breaker.state}")
+        return result
+
+    r = scenario("1. Backend saudável")
+    check("todas as leituras vêm do backend", r["ok"] == args.calls)
+
+    r = scenario("2. 30% das respostas demoram 2 s (prazo de 0,5 s)", slow=0.3, delay=2.0)
+    check(f"nenhuma leitura passa do pior caso ({worst_ms:.0f} ms)", r["max_ms"] <= worst_ms + 200)
+    check("as novas tentativas recuperam a maioria das leituras", r["ok"] >= args.calls * 0.8)
+
+    deadlines, retries = executor.stats["prazos_estourados"], executor.stats["tentativas_extras"]
+    r = scenario("3. 40% das respostas com erro 503", errors=0.4)
+    check("os 503 chegam como erro do servidor, sem estourar o prazo", executor.stats["prazos_estourados"] == deadlines)
+    check("os 503 são repetidos como falha transitória", executor.stats["tentativas_extras"] > retries)
+    check("as novas tentativas recuperam a maioria das leituras", r["ok"] >= args.calls * 0.8)
+
+    r = scenario("4. Backend fora do ar (conexões travadas)", calls=10, down=True)
+    check("disjuntor aberto", breaker.state == OPEN)
+    check("nenhuma leitura falha: todas usam os dados salvos", r["falhas"] == 0 and r["salvos"] == 10)
+    faults.set(down=True)
+    r = run_calls(executor, client, 10)
+    check(f"com o disjuntor aberto a leitura não espera o backend (p95 {r['p95_ms']:.1f} ms)", r["p95_ms"] < 50)
+
+    time.sleep(BACKENDS["supabase"]["reset_timeout"] + 0.1)
+    r = scenario("5. Backend volta após o tempo de espera do disjuntor", calls=10)
+    check("disjuntor fechado pela chamada de teste", breaker.state == CLOSED)
+    check("leituras voltam a vir do backend", r["ok"] == 10)
+
+    print(f"\nEstatísticas do executor: {executor.stats}")
+    server.shutdown()
+    sys.exit(0 if all(checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Tempo de reexecução da fila do suporte (pages/6_Aguardando_Suporte.py) e do checklist
+(pages/5_Checklist.py): página inteira x fragmento.
+
+Antes, qualquer interação (toggle de resolução, botão do DOCX, seleção em lote; foto,
+assinatura ou item do checklist) executava a página inteira. Agora cada uma executa só o
+fragmento da sua seção. Roda as páginas com AppTest contra um substituto local do PostgREST
+(N OS aguardando suporte; um template com N itens) e compara o tempo da execução completa
+com o tempo de cada seção, registrado por `timed_section` em st.session_state['_tempos_secoes'].
+
+O componente de canvas só desenha no navegador e não carrega no AppTest; no checklist ele é
+trocado por um substituto que devolve uma assinatura já enviada, do tamanho da real.
+
+Uso (a partir da raiz do projeto):
+
+    python benchmarks/fragment_rerun_benchmark.py [--orders 10 20 40 --items 20 60 200 --runs 5]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+PAGE = os.path.join(ROOT, "pages", "6_Aguardando_Suporte.py")
+SECTIONS = ["Finalização em lote", "Cartão da OS", "Registros visuais", "Exportação DOCX"]
+CHECKLIST_PAGE = os.path.join(ROOT, "pages", "5_Checklist.py")
+CHECKLIST_SECTIONS = ["Fotos", "Assinaturas", "Checklist"]
+
+rows = []
+templates = []
+
+
+def synthetic_order(i):
+    items = {f"Item {n}": ("Defeito" if n % 7 == 0 else "Intacto") for n in range(40)}
+    urls = {key: f"https://exemplo.supabase.co/storage/v1/object/public/fotos_os/os-{i}/{key}.png" for key in ("placa", "local", "rastreador", "extra")}
+    return {
+        "id": f"{i:08d}-0000-0000-0000-000000000000", "status": "Aguardando Suporte",
+        "tecnico_nome": f"Técnico {i % 5}", "cliente_nome": f"Cliente {i}", "veiculo_placa": f"ABC{i:04d}",
+        "veiculo_modelo": "Modelo", "veiculo_tipo": "Carro", "rastreador_id": f"R{i}", "bloqueio_instalado": i % 2 == 0,
+        "observacoes": "Sem observações.", "data_finalizacao": f"2026-10-19T10:{i % 60:02d}:00",
+        "checklist_respostas": json.dumps(items),
+        "fotos_urls": json.dumps(urls), "fotos_miniaturas_urls": json.dumps(urls),
+        "assinaturas_urls": json.dumps({"tecnico": urls["placa"], "cliente": urls["local"]}),
+        "assinaturas_miniaturas_urls": "{}",
+    }
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps(templates if "templates_checklist" in self.path else rows).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def canvas_stand_in():
+    """Módulo no lugar do streamlit_drawable_canvas: cada canvas devolve uma assinatura com um traço."""
+    image = np.full((150, 400, 4), 238, dtype=np.uint8)
+    image[70:73, 50:350, :3] = 0
+    module = types.ModuleType("streamlit_drawable_canvas")
+    module.st_canvas = lambda **kwargs: types.SimpleNamespace(image_data=image, json_data={"objects": [{"type": "path"}]})
+    return module
+
+
+def checklist_app(port, cache_path, items):
+    at = AppTest.from_file(CHECKLIST_PAGE, default_timeout=60)
+    at.secrets["supabase"] = {"url": f"http://127.0.0.1:{port}", "key": "chave-local"}
+    at.secrets["cache"] = {"path": cache_path}
+    at.session_state["logged_in"] = True
+    at.session_state["user_id"] = "tecnico-1"
+    at.session_state["user_info"] = {"nome": "Técnico", "nivel_acesso": "tecnico"}
+    order = synthetic_order(0)
+    order["veiculo_tipo"] = f"Modelo com {items} itens"
+    at.session_state["selected_os_id"] = order["id"]
+    at.session_state["selected_os"] = order
+    return at
+
+
+def time_page(at, sections, runs):
+    """Medianas (ms) da página inteira e de cada seção em `runs` execuções, depois de uma de aquecimento."""
+    at.run()
+    page, times = [], {name: [] for name in sections}
+    for _ in range(runs):
+        started = time.perf_counter()
+        at.run()
+        page.append((time.perf_counter() - started) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        for name in sections:
+            times[name].append(at.session_state["_tempos_secoes"][name])
+    return statistics.median(page), {name: statistics.median(values) for name, values in times.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, nargs="+", default=[10, 20, 40])
+    parser.add_argument("--items", type=int, nargs="+", default=[20, 60, 200], help="itens do template no checklist")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    feed_path = os.path.join(tempfile.mkdtemp(), "eventos.sqlite3")
+    cache_path = os.path.join(tempfile.mkdtemp(), "compartilhado.sqlite3")
+    # Os templates vêm todos em uma consulta (e ficam no cache compartilhado): um tipo de veículo por tamanho
+    templates[:] = [{"tipo_veiculo": f"Modelo com {items} itens", "itens": [f"Item {n}" for n in range(items)]} for items in args.items]
+
+    print("Fila do suporte (pages/6_Aguardando_Suporte.py)")
+    print(f"{'OS na fila':<12}{'Página (ms)':>13}" + "".join(f"{name + ' (ms)':>26}" for name in SECTIONS))
+    for orders in args.orders:
+        rows[:] = [synthetic_order(i) for i in range(orders)]
+        st.cache_resource.clear()  # nova visão das OS em aberto, carregada com as linhas deste tamanho
+        at = AppTest.from_file(PAGE, default_timeout=60)
+        at.secrets["supabase"] = {"url": f"http://127.0.0.1:{server.server_port}", "key": "chave-local"}
+        at.secrets["realtime"] = {"feed": "local", "path": feed_path}
+        at.secrets["cache"] = {"path": cache_path}
+        at.session_state["logged_in"] = True
+        at.session_state["user_id"] = "suporte-1"
+        at.session_state["user_info"] = {"nome": "Suporte", "nivel_acesso": "suporte"}
+        page, sections = time_page(at, SECTIONS, args.runs)
+        assert len(at.expander) == orders
+        print(f"{orders:<12}{page:>13.1f}" + "".join(f"{sections[name]:>26.1f}" for name in SECTIONS))
+
+    sys.modules["streamlit_drawable_canvas"] = canvas_stand_in()
+    print("\nChecklist (pages/5_Checklist.py), com e sem o modo grade")
+    print(f"{'Itens':<8}{'Modo':<9}{'Página (ms)':>13}" + "".join(f"{name + ' (ms)':>18}" for name in CHECKLIST_SECTIONS))
+    for items in args.items:
+        for grid in (False, True):
+            at = checklist_app(server.server_port, cache_path, items)
+            at.run()
+            next(t for t in at.toggle if t.label == "Modo grade (compacto)").set_value(grid)
+            page, sections = time_page(at, CHECKLIST_SECTIONS, args.runs)
+            assert len(at.radio) == (0 if grid else items)
+            print(f"{items:<8}{'grade' if grid else 'rádios':<9}{page:>13.1f}" + "".join(f"{sections[name]:>18.1f}" for name in CHECKLIST_SECTIONS))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Visão ao vivo das OS em aberto (utils/live_orders.py) x consultas com TTL por sessão.
+
+Sobe um substituto local do PostgREST com uma tabela de OS em memória e mantém uma
+`LiveOrders` alimentada pelo feed local (SQLite). Uma thread faz o papel de outro
+processo (outra réplica ou a fila de tarefas): altera OS e publica no feed. Mede:
+
+- consultas ao banco durante a execução, comparadas com o que N sessões abertas fariam
+  com o TTL de 60 s das listas;
+- o tempo entre a mudança e a visão refleti-la (com TTL: até 60 s, em média 30 s);
+- quantas sessões de técnico precisariam ser executadas de novo a cada mudança: só as
+  que exibem a OS alterada, em vez de todas a cada TTL.
+
+Uso (a partir da raiz do projeto):
+
+    python benchmarks/live_orders_benchmark.py [--orders 300 --technicians 50 --changes 40 --interval 0.25]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from supabase import create_client  # noqa: E402
+
+from utils.live_orders import LiveOrders, LocalFeed, fingerprint  # noqa: E402
+from utils.transitions import AGUARDANDO_SUPORTE, EM_ANDAMENTO, PENDENTE  # noqa: E402
+
+TTL = 60  # segundos, o TTL que get_pending_os e get_awaiting_support_os usavam
+
+
+class Table:
+    def __init__(self):
+        self.rows = {}
+        self.lock = threading.Lock()
+        self.queries = 0
+
+
+table = Table()
+
+
+def _in_values(value):
+    return [v.strip().strip('"') for v in value[len("in.("):-1].split(",")]
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        with table.lock:
+            table.queries += 1
+            rows = list(table.rows.values())
+        for column in ("status", "id"):
+            if column in params:
+                allowed = set(_in_values(params[column][0]))
+                rows = [row for row in rows if row[column] in allowed]
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--technicians", type=int, default=50)
+    parser.add_argument("--changes", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.25, help="segundos entre mudanças")
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    technicians = [f"tec-{i}" for i in range(args.technicians)]
+    for i in range(args.orders):
+        table.rows[f"os-{i}"] = {
+            "id": f"os-{i}", "status": rng.choice([PENDENTE, EM_ANDAMENTO, AGUARDANDO_SUPORTE]),
+            "tecnico_atribuido_id": rng.choice(technicians), "created_at": f"2026-10-01T00:00:{i % 60:02d}",
+        }
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = create_client(f"http://127.0.0.1:{server.server_port}", "chave-local")
+    feed_path = os.path.join(tempfile.mkdtemp(), "eventos.sqlite3")
+    view = LiveOrders(client, LocalFeed(feed_path))
+    view.start()
+    view.wait_ready()
+    time.sleep(0.5)
+
+    # O "outro processo" usa sua própria conexão ao feed, como uma réplica ou a fila de tarefas
+    publisher = LocalFeed(feed_path)
+    slices = lambda: {tec: fingerprint(view.select(order_by='created_at', status=PENDENTE, tecnico_atribuido_id=tec)) for tec in technicians}  # noqa: E731
+    shown = slices()
+    queries_before = table.queries
+    latencies, reruns = [], []
+    started = time.perf_counter()
+    for n in range(args.changes):
+        os_id = f"os-{rng.randrange(args.orders)}" if n % 2 else f"nova-{n}"
+        with table.lock:
+            row = dict(table.rows.get(os_id) or {"id": os_id, "created_at": "2026-10-19T00:00:00"})
+            row.update({"status": PENDENTE if row.get("status") != PENDENTE else EM_ANDAMENTO, "tecnico_atribuido_id": rng.choice(technicians)})
+            table.rows[os_id] = row
+        changed_at = time.perf_counter()
+        publisher.publish([os_id])
+        while not any(r['id'] == os_id and r['status'] == row['status'] for r in view.select(status=row['status'])):
+            time.sleep(0.005)
+        latencies.append((time.perf_counter() - changed_at) * 1000)
+        current = slices()
+        reruns.append(sum(shown[tec] != current[tec] for tec in technicians))
+        shown = current
+        time.sleep(args.interval)
+    elapsed = time.perf_counter() - started
+    queries = table.queries - queries_before
+    view.stop()
+    server.shutdown()
+
+    ttl_queries = args.technicians * elapsed / TTL
+    print(f"{args.orders} OS, {args.technicians} técnicos com a lista aberta, {args.changes} mudanças em {elapsed:.1f} s\n")
+    print(f"{'':<48} {'TTL 60 s':>12} {'Visão ao vivo':>14}")
+    print(f"{'Consultas ao banco no período':<48} {ttl_queries:>12.0f} {queries:>14}")
+    print(f"{'Consultas por hora com as sessões ociosas':<48} {args.technicians * 3600 / TTL:>12.0f} {3600 / 300:>14.0f}")
+    print(f"{'Atraso até a mudança aparecer (ms, média)':<48} {TTL * 500:>12.0f} {statistics.mean(latencies):>14.0f}")
+    print(f"{'Atraso até a mudança aparecer (ms, máximo)':<48} {TTL * 1000:>12.0f} {max(latencies):>14.0f}")
+    print(f"{'Sessões executadas de novo por mudança (média)':<48} {'-':>12} {statistics.mean(reruns):>14.1f}")
+    print(f"{'Sessões executadas de novo a cada TTL':<48} {args.technicians:>12} {'-':>14}")
+
+
+if __name__ == "__main__":
+    main()
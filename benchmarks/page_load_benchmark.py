@@ -0,0 +1,64 @@
+"""
+Benchmark do carregamento de dados por página: consultas em sequência x `load_concurrently`.
+
+As consultas de cada página são simuladas com a latência informada (ida e volta ao
+Supabase), para comparar os dois modos sem depender do banco. Em produção, os tempos
+reais de cada rodada aparecem no log ("<página>: N consultas em X ms (em sequência: Y ms)").
+
+Uso (a partir da raiz do projeto):
+
+    python benchmarks/page_load_benchmark.py [--latency-ms 80] [--jitter-ms 30] [--runs 20]
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.bootstrap import load_concurrently  # noqa: E402
+
+# Consultas independentes que cada página dispara ao carregar
+# (Dashboard, Ordens Pendentes e a fila do suporte leem da visão ao vivo das OS em
+# aberto, em memória; ver benchmarks/live_orders_benchmark.py)
+PAGES = {
+    "Nova OS": ["technicians", "templates"],
+    # Só quando o checklist é aberto sem passar pela lista de pendentes; vindo dela, a OS
+    # já está na sessão e os templates já estão em cache, sem nenhuma consulta
+    "Checklist": ["os_data", "templates"],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=30)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    rng = random.Random(1)
+
+    def query():
+        time.sleep((args.latency_ms + rng.uniform(0, args.jitter_ms)) / 1000)
+        return True
+
+    print(f"{'Página':<22}{'Sequencial (ms)':>17}{'Concorrente (ms)':>18}{'Ganho':>8}")
+    for page, names in PAGES.items():
+        serial, concurrent = [], []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            for _name in names:
+                query()
+            serial.append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            load_concurrently(page, **{name: query for name in names})
+            concurrent.append((time.perf_counter() - t0) * 1000)
+        s, c = statistics.median(serial), statistics.median(concurrent)
+        print(f"{page:<22}{s:>17.0f}{c:>18.0f}{s / c:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
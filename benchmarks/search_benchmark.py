@@ -0,0 +1,100 @@
+"""
+Benchmark da busca de OS no índice local (SQLite FTS5 trigram) com dados sintéticos.
+
+Uso (a partir da raiz do projeto):
+
+    python benchmarks/search_benchmark.py [--rows 1000000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.search import LocalSearchIndex, normalize_query  # noqa: E402
+
+NOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+         "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa"]
+PRIMEIROS = ["Ana", "João", "Maria", "José", "Carlos", "Paulo", "Lucas", "Juliana", "Marcos", "Fernanda",
+             "Transportes", "Logística", "Agro", "Construtora", "Mineração"]
+RUAS = ["Rua das Flores", "Av. Brasil", "Rua Sete de Setembro", "Av. Amazonas", "Rua Dom Pedro II",
+        "Rodovia BR-364", "Av. Jorge Teixeira", "Rua Getúlio Vargas"]
+CIDADES = ["Porto Velho", "Ji-Paraná", "Ariquemes", "Vilhena", "Cacoal", "Rio Branco", "Manaus"]
+STATUS = ["Pendente", "Em Andamento", "Aguardando Suporte", "Finalizada"]
+
+
+def random_plate(rng):
+    return "".join(rng.choices(string.ascii_uppercase, k=3)) + str(rng.randint(0, 9)) + \
+        rng.choice(string.ascii_uppercase) + f"{rng.randint(0, 99):02d}"
+
+
+def synthetic_rows(count, seed=42):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    for i in range(count):
+        yield {
+            "id": f"{i:08x}-0000-4000-8000-{rng.getrandbits(48):012x}",
+            "status": rng.choice(STATUS),
+            "veiculo_placa": random_plate(rng),
+            "veiculo_modelo": "Modelo",
+            "cliente_nome": f"{rng.choice(PRIMEIROS)} {rng.choice(NOMES)} {rng.choice(NOMES)}",
+            "cliente_endereco": f"{rng.choice(RUAS)}, {rng.randint(1, 9999)} - {rng.choice(CIDADES)}",
+            "rastreador_id": f"RST{rng.randint(0, 99_999_999):08d}",
+            "tecnico_nome": rng.choice(PRIMEIROS),
+            "created_at": (start + timedelta(minutes=i)).isoformat(),
+        }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    index = LocalSearchIndex()
+    start = time.perf_counter()
+    sample = []
+    batch = []
+    for row in synthetic_rows(args.rows):
+        batch.append(row)
+        if len(batch) == 10_000:
+            index.add(batch)
+            sample.extend(batch[:5])
+            batch = []
+    if batch:
+        index.add(batch)
+        sample.extend(batch[:5])
+    print(f"Índice com {args.rows:,} OS construído em {time.perf_counter() - start:.1f} s")
+
+    rng = random.Random(7)
+    scenarios = {
+        "placa": lambda row: row["veiculo_placa"][:5],
+        "rastreador": lambda row: row["rastreador_id"][-6:],
+        "cliente": lambda row: row["cliente_nome"],
+        "endereço": lambda row: row["cliente_endereco"].split(" - ")[0],
+        "termo comum (página 10)": lambda row: "silva",
+    }
+    print(f"{'Cenário':<26}{'p50 (ms)':>10}{'p95 (ms)':>10}{'máx (ms)':>10}")
+    for name, make_query in scenarios.items():
+        timings = []
+        for _ in range(args.queries):
+            query = normalize_query(make_query(rng.choice(sample)))
+            offset = args.page_size * 9 if "página 10" in name else 0
+            t0 = time.perf_counter()
+            index.search(query, args.page_size, offset)
+            timings.append((time.perf_counter() - t0) * 1000)
+        print(f"{name:<26}{statistics.median(timings):>10.1f}{percentile(timings, 95):>10.1f}{max(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Memória por sessão do checklist (pages/5_Checklist.py): antes e depois de gravar as
+fotos em disco e remover as cópias na conversão das assinaturas.
+
+Mede, com fotos e assinaturas sintéticas do tamanho das reais:
+- a memória da sessão depois de enviar o checklist com as 4 fotos e as 2 assinaturas, pelo
+  `session_memory_report()` de uma sessão real (AppTest): antes, as fotos ficam no
+  gerenciador de uploads e os arrays das assinaturas no session_state; depois, o
+  `on_change` das câmeras chama `spill_upload`, como o `spill_photo` da página, e o envio
+  grava as assinaturas em PNG e tira os arrays da sessão, como o `submit_checklist`. A
+  página em si não roda aqui (o canvas não carrega no AppTest), então a sessão usa um
+  script com as mesmas câmeras e chaves;
+- o pico de alocação ao converter as duas assinaturas para PNG (tracemalloc).
+
+As 4 fotos são tiradas na mesma execução: o AppTest reenvia a cada execução as fotos que
+ainda estão no session_state, o que não acontece no navegador depois de `release_upload`.
+Nessa execução os valores das câmeras ainda apontam para os bytes das fotos; na seguinte,
+o Streamlit não as encontra mais no gerenciador e devolve um `DeletedFile`. Por isso o
+relatório, como o da página, conta as fotos pelo gerenciador de uploads.
+
+Uso (a partir da raiz do projeto):
+
+    python benchmarks/session_memory_benchmark.py [--width 1280 --height 720 --sessions 50]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FOTOS = ["placa", "local", "rastreador", "extra"]
+CANVAS_SHAPE = (150, 400, 4)  # altura, largura e RGBA dos canvas de assinatura
+
+
+def synthetic_photo(width, height, seed):
+    """JPEG com ruído e gradiente, comprimido como uma foto de celular (~qualidade 85)."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    pixels = np.clip(gradient + rng.normal(0, 40, (height, width, 3)), 0, 255).astype(np.uint8)
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+def synthetic_signature(seed):
+    """Array RGBA uint8 como o devolvido pelo canvas, com alguns traços."""
+    rng = np.random.default_rng(seed)
+    canvas = np.full(CANVAS_SHAPE, 238, dtype=np.uint8)
+    canvas[..., 3] = 255
+    for _ in range(40):
+        y, x = rng.integers(0, CANVAS_SHAPE[0] - 4), rng.integers(0, CANVAS_SHAPE[1] - 40)
+        canvas[y:y + 3, x:x + 40, :3] = 0
+    return canvas
+
+
+def process_signature_before(image_data):
+    img = Image.fromarray(image_data.astype('uint8'), 'RGBA')
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def process_signature_after(image_data, path):
+    Image.fromarray(image_data.astype('uint8', copy=False)).save(path, format="PNG")
+
+
+# Câmeras do checklist; com `_gravar_em_disco`, cada foto vai para o disco no on_change
+SESSION_SCRIPT = """
+import os
+import streamlit as st
+from PIL import Image
+from utils.session_memory import session_memory_report, spill_upload
+
+def spill(key):
+    foto = st.session_state.get(f"camera_{key}")
+    if foto is not None:
+        spill_upload(foto, os.path.join(st.session_state["_pasta"], f"{key}.jpg"))
+
+for key in st.session_state["_fotos"]:
+    st.camera_input(key, key=f"camera_{key}", on_change=spill if st.session_state["_gravar_em_disco"] else None, args=(key,))
+if st.session_state["_gravar_em_disco"] and "assinaturas_canvas" in st.session_state:
+    # Envio: as assinaturas vão para o disco e os arrays saem da sessão
+    for key, image in st.session_state.pop("assinaturas_canvas").items():
+        Image.fromarray(image).save(os.path.join(st.session_state["_pasta"], f"{key}.png"))
+st.session_state.pop("_relatorio", None)
+st.session_state["_relatorio"] = session_memory_report()
+"""
+
+
+def session_kb(photos, signatures, spill):
+    """Memória da sessão (KB) e uploads em memória depois do envio, medida pela própria sessão."""
+    at = AppTest.from_string(SESSION_SCRIPT, default_timeout=60)
+    at.session_state["_fotos"] = FOTOS
+    at.session_state["_pasta"] = tempfile.mkdtemp()
+    at.session_state["_gravar_em_disco"] = spill
+    at.session_state["assinaturas_canvas"] = {"tecnico": signatures[0], "cliente": signatures[1]}
+    at.run()
+    for key, photo in zip(FOTOS, photos):
+        at.camera_input(key=f"camera_{key}").set_value((f"{key}.jpg", photo, "image/jpeg"))
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    report = at.session_state["_relatorio"]
+    return report["total_bytes"] / 1024, report["uploads"]
+
+
+def peak_kb(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--sessions", type=int, default=50, help="técnicos simultâneos para a projeção")
+    args = parser.parse_args()
+
+    photos = [synthetic_photo(args.width, args.height, seed) for seed in range(len(FOTOS))]
+    signatures = [synthetic_signature(seed) for seed in range(2)]
+    photos_kb = sum(len(p) for p in photos) / 1024
+    canvas_kb = sum(s.nbytes for s in signatures) / 1024
+
+    tmp = tempfile.mkdtemp()
+    before_kb = peak_kb(lambda: [process_signature_before(s) for s in signatures])
+    after_kb = peak_kb(lambda: [process_signature_after(s, os.path.join(tmp, f"{i}.png")) for i, s in enumerate(signatures)])
+    session_before, uploads_before = session_kb(photos, signatures, spill=False)
+    session_after, uploads_after = session_kb(photos, signatures, spill=True)
+
+    print(f"Fotos: {len(FOTOS)} x {args.width}x{args.height} JPEG = {photos_kb:.0f} KB | assinaturas: 2 x {CANVAS_SHAPE} = {canvas_kb:.0f} KB\n")
+    print(f"{'':<48} {'Antes':>10} {'Depois':>10}")
+    print(f"{'Pico ao converter as assinaturas (KB)':<48} {before_kb:>10.0f} {after_kb:>10.0f}")
+    print(f"{'Memória da sessão após o envio (KB)':<48} {session_before:>10.0f} {session_after:>10.0f}")
+    print(f"{'Uploads no gerenciador do Streamlit':<48} {uploads_before:>10} {uploads_after:>10}")
+    print(f"{f'{args.sessions} sessões (MB)':<48} {session_before * args.sessions / 1024:>10.1f} {session_after * args.sessions / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark de partida a frio: custo das importações de nível de módulo de cada página,
+medido em um interpretador novo, comparando uma revisão anterior do git com a árvore atual.
+
+As consultas ao Supabase são as mesmas antes e depois, então o tempo até a primeira
+renderização de uma página em um container novo varia basicamente com o que ela importa
+antes de desenhar o primeiro elemento.
+
+Uso (a partir da raiz do projeto):
+
+    python benchmarks/startup_benchmark.py --before <revisão> [--runs 7]
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = [
+    "1_Login.py",
+    "pages/2_Dashboard.py",
+    "pages/3_Nova_OS.py",
+    "pages/4_Ordens_Pendentes.py",
+    "pages/5_Checklist.py",
+    "pages/6_Aguardando_Suporte.py",
+    "pages/7_Relatorios.py",
+    "pages/8_Admin.py",
+]
+
+
+def top_level_imports(source):
+    """Retorna as instruções de import executadas ao carregar a página (fora de funções)."""
+    tree = ast.parse(source)
+    statements = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(ast.unparse(node))
+    return statements
+
+
+def read_source(page, revision):
+    if revision is None:
+        with open(os.path.join(ROOT, page), encoding="utf-8") as f:
+            return f.read()
+    return subprocess.check_output(["git", "show", f"{revision}:{page}"], cwd=ROOT, text=True)
+
+
+def checkout_utils(revision, target):
+    """Extrai o pacote utils/ da revisão, já que as páginas antigas podem depender dele."""
+    listing = subprocess.run(
+        ["git", "ls-tree", "-r", "--name-only", revision, "utils"],
+        cwd=ROOT, text=True, capture_output=True
+    ).stdout.split()
+    for path in listing:
+        content = subprocess.check_output(["git", "show", f"{revision}:{path}"], cwd=ROOT)
+        destination = os.path.join(target, path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with open(destination, "wb") as f:
+            f.write(content)
+
+
+def time_imports(statements, cwd, runs):
+    """Mediana, em ms, do tempo para executar as importações em um interpretador novo."""
+    code = "\n".join([
+        "import sys, time",
+        "sys.path.insert(0, '.')",
+        "start = time.perf_counter()",
+        *statements,
+        "print((time.perf_counter() - start) * 1000)",
+    ])
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--before", required=True, help="Revisão do git usada como referência (ex.: HEAD~1).")
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as old_tree:
+        checkout_utils(args.before, old_tree)
+
+        print(f"{'Página':<32}{'Antes (ms)':>12}{'Depois (ms)':>13}{'Ganho':>9}")
+        for page in PAGES:
+            before = time_imports(top_level_imports(read_source(page, args.before)), old_tree, args.runs)
+            after = time_imports(top_level_imports(read_source(page, None)), ROOT, args.runs)
+            if before is None or after is None:
+                print(f"{page:<32}{'erro':>12}{'':>13}")
+                continue
+            gain = f"{before / after:.1f}x" if after else "-"
+            print(f"{page:<32}{before:>12.0f}{after:>13.0f}{gain:>9}")
+
+
+if __name__ == "__main__":
+    main()
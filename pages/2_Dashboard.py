@@ -1,40 +1,24 @@
 import streamlit as st
-from supabase import create_client, Client
+from utils.bootstrap import get_live_orders, require_login, watch_live_orders
+from utils.transitions import AGUARDANDO_SUPORTE, PENDENTE
 
 # --- Verificação de Login ---
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("Você precisa estar logado para acessar esta página.")
-    st.switch_page("1_Login.py")
-    st.stop()
+user_info = require_login(redirect=True)
 
-# --- Conexão com Supabase ---
-@st.cache_resource
-def init_supabase_connection():
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
-supabase: Client = init_supabase_connection()
-user_info = st.session_state.get('user_info', {})
 user_id = st.session_state.get('user_id')
 
-# --- Funções de Busca ---
-@st.cache_data(ttl=300)
+# --- Contagens ---
 def get_stats(user_id, access_level):
-    stats = {
-        "pendentes": 0,
-        "aguardando_suporte": 0,
-    }
-    # Contagem de OS Pendentes para o técnico logado
+    """
+    Contagens que o nível de acesso exibe, lidas da visão ao vivo das OS em aberto
+    (sem consultas ao Supabase; a visão é atualizada pelo feed de mudanças).
+    """
+    live = get_live_orders()
+    stats = {"pendentes": 0, "aguardando_suporte": 0}
     if access_level == 'tecnico':
-        response = supabase.table('ordens_de_servico').select('id', count='exact').eq('tecnico_atribuido_id', user_id).eq('status', 'Pendente').execute()
-        stats["pendentes"] = response.count
-
-    # Contagem de OS Aguardando Suporte (para Suporte, Gestor, Admin)
+        stats["pendentes"] = live.count(status=PENDENTE, tecnico_atribuido_id=user_id)
     if access_level in ['suporte', 'gestor', 'admin']:
-        response = supabase.table('ordens_de_servico').select('id', count='exact').eq('status', 'Aguardando Suporte').execute()
-        stats["aguardando_suporte"] = response.count
-    
+        stats["aguardando_suporte"] = live.count(status=AGUARDANDO_SUPORTE)
     return stats
 
 # --- Interface do Dashboard ---
@@ -44,6 +28,7 @@ st.markdown("---")
 
 access_level = user_info.get('nivel_acesso')
 stats = get_stats(user_id, access_level)
+watch_live_orders(lambda: get_stats(user_id, access_level))
 
 # --- Visualização para Técnico ---
 if access_level == 'tecnico':
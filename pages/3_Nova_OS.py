@@ -1,41 +1,24 @@
 import streamlit as st
-from supabase import create_client, Client
 import uuid
 import json
+from utils.bootstrap import get_all_checklist_templates, get_supabase, get_technicians, load_concurrently, require_login
+from utils.live_orders import publish_change
+from utils.resilience import get_executor
+from utils.transitions import PENDENTE
 
 # --- Verificação de Login e Permissão ---
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("Você precisa estar logado para acessar esta página.")
-    st.stop()
-
-user_info = st.session_state.get('user_info', {})
+user_info = require_login(['suporte', 'gestor', 'admin'])
 access_level = user_info.get('nivel_acesso')
 
-if access_level not in ['suporte', 'gestor', 'admin']:
-    st.error("Você não tem permissão para acessar esta página.")
-    st.stop()
-
 # --- Conexão com Supabase ---
-@st.cache_resource
-def init_supabase_connection():
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
-supabase: Client = init_supabase_connection()
+supabase = get_supabase()
 
 # --- Funções ---
-@st.cache_data(ttl=600)
-def get_technicians():
-    """Busca todos os usuários com nível de acesso 'tecnico'."""
-    response = supabase.table('usuarios').select('id, nome').eq('nivel_acesso', 'tecnico').execute()
-    techs = {item['nome']: item['id'] for item in response.data}
-    return techs
-
 def create_os(data):
     """Cria uma nova Ordem de Serviço no Supabase."""
     try:
-        response = supabase.table('ordens_de_servico').insert(data).execute()
+        response = get_executor().call("supabase", supabase.table('ordens_de_servico').insert(data).execute)
+        publish_change([response.data[0]['id']])  # aparece na hora na lista do técnico
         return True, response.data[0]['id']
     except Exception as e:
         return False, str(e)
@@ -51,7 +34,9 @@ st.set_page_config(layout="wide")
 st.title("📋 Criar Nova Ordem de Serviço")
 st.markdown("Preencha os dados abaixo para registrar uma nova OS.")
 
-technicians = get_technicians()
+loaded = load_concurrently("Nova OS", technicians=get_technicians, templates=get_all_checklist_templates)
+technicians = loaded["technicians"]
+templates = loaded["templates"]
 if not technicians:
     st.warning("Nenhum técnico encontrado no sistema. Cadastre técnicos no painel de admin.")
     st.stop()
@@ -112,12 +97,15 @@ with st.form("nova_os_form", clear_on_submit=True):
                     "tecnico_atribuido_id": tecnico_id,
                     "tecnico_nome": tecnico_nome_selecionado,
                     "criado_por_suporte_id": st.session_state['user_id'],
-                    "status": "Pendente",
+                    "status": PENDENTE,
+                    "atualizado_por": st.session_state['user_id'],
                 }
                 
                 success, result = create_os(os_data)
                 
                 if success:
                     st.success(f"Ordem de Serviço criada com sucesso! ID: {result[:8]}...")
+                    if not templates.get(veiculo_tipo.lower()):
+                        st.warning(f"Não há template de checklist para o tipo de veículo '{veiculo_tipo}'. Crie um no Painel de Admin antes que o técnico inicie o serviço.")
                 else:
                     st.error(f"Erro ao criar OS: {result}")
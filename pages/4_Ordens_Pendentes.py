@@ -1,36 +1,33 @@
 import streamlit as st
-from supabase import create_client, Client
 import json
+from utils.bootstrap import get_all_checklist_templates, get_live_orders, get_supabase, prefetch, require_login, watch_live_orders
+from utils.transitions import EM_ANDAMENTO, PENDENTE, transition_orders
 
 # --- Verificação de Login ---
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("Você precisa estar logado para acessar esta página.")
-    st.stop()
+user_info = require_login()
 
 # --- Conexão com Supabase ---
-@st.cache_resource
-def init_supabase_connection():
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
-supabase: Client = init_supabase_connection()
-user_info = st.session_state.get('user_info', {})
+supabase = get_supabase()
 user_id = st.session_state.get('user_id')
 
 # --- Funções ---
-@st.cache_data(ttl=60)
 def get_pending_os(technician_id):
-    """Busca as OS pendentes para um técnico específico."""
-    response = supabase.table('ordens_de_servico').select("*").eq('tecnico_atribuido_id', technician_id).eq('status', 'Pendente').order('created_at').execute()
-    return response.data
+    """OS pendentes de um técnico, da visão ao vivo das OS em aberto."""
+    return get_live_orders().select(order_by='created_at', status=PENDENTE, tecnico_atribuido_id=technician_id)
 
-def start_service(os_id):
-    """Muda o status da OS para 'Em Andamento'."""
+def start_service(os_data):
+    """
+    Muda o status da OS para 'Em Andamento', se ela ainda estiver pendente, e deixa a OS
+    já carregada na sessão para o checklist não precisar buscá-la de novo.
+    """
+    os_id = os_data['id']
     try:
-        supabase.table('ordens_de_servico').update({"status": "Em Andamento"}).eq('id', os_id).execute()
+        changed, _ = transition_orders(supabase, [os_id], PENDENTE, EM_ANDAMENTO, user_id)
+        if not changed:
+            st.error("Esta OS não está mais pendente; ela pode ter sido alterada por outro usuário.")
+            return False
         st.session_state['selected_os_id'] = os_id
-        st.cache_data.clear() # Limpa o cache para refletir a mudança
+        st.session_state['selected_os'] = {**os_data, 'status': EM_ANDAMENTO}
         return True
     except Exception as e:
         st.error(f"Erro ao iniciar serviço: {e}")
@@ -41,6 +38,11 @@ st.set_page_config(layout="wide")
 st.title("✅ Minhas Ordens de Serviço Pendentes")
 
 pending_os_list = get_pending_os(user_id)
+watch_live_orders(lambda: get_pending_os(user_id))
+# Deixa os templates em cache para quando o técnico abrir o checklist, em segundo plano
+# para não atrasar a lista
+if pending_os_list:
+    prefetch(get_all_checklist_templates)
 
 if not pending_os_list:
     st.info("Você não tem nenhuma Ordem de Serviço pendente no momento. Bom trabalho! 👍")
@@ -88,6 +90,6 @@ else:
             st.warning(os.get('problema_reclamado', 'Nenhum detalhe fornecido.'))
             
             if st.button("Iniciar Serviço", key=f"start_{os['id']}"):
-                if start_service(os['id']):
+                if start_service(os):
                     st.success(f"Iniciando serviço para a OS {os['id'][:8]}...")
                     st.switch_page("pages/5_Checklist.py")
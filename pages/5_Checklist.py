@@ -1,14 +1,75 @@
 import streamlit as st
-from supabase import create_client, Client
-from streamlit_drawable_canvas import st_canvas
+import os
 from datetime import datetime
-import io
-import json
-from PIL import Image
+from utils.bootstrap import get_all_checklist_templates, get_job_queue, get_supabase, lazy_import, load_concurrently, render_job_status, require_login, timed_section
+from utils.checklist import DEFEITO, INTACTO, encode_sparse
+from utils.resilience import resilient_read
+from utils.session_memory import log_session_memory, session_memory_report, spill_upload
+from utils.transitions import AGUARDANDO_SUPORTE, status_update
+
+# PIL só é necessário no envio do checklist
+Image = lazy_import("PIL.Image")
+
+FOTOS = {
+    "placa": ("Foto da Placa do Veículo", "placa.png"),
+    "local": ("Foto do Local de Instalação", "local_instalacao.png"),
+    "rastreador": ("Foto do Rastreador (Número de Série)", "rastreador.png"),
+    "extra": ("Foto Extra (Opcional)", "extra.png"),
+}
 
 # --- Verificação de Login e OS Selecionada ---
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("Você precisa estar logado para acessar esta página.")
+user_info = require_login()
+
+# Chaves da sessão com o checklist em preenchimento (widgets e resultados das seções)
+CHECKLIST_KEYS = ["canvas_tecnico", "canvas_cliente", "assinaturas_canvas", *(f"camera_{k}" for k in FOTOS)]
+
+def finish_checklist(job_os_id):
+    """Libera a sessão do checklist enviado; só é chamada quando o upload foi concluído."""
+    st.session_state.get('fotos_em_disco', {}).pop(job_os_id, None)
+    if st.session_state.get('selected_os_id') == job_os_id:
+        for key in CHECKLIST_KEYS:
+            st.session_state.pop(key, None)
+        del st.session_state['selected_os_id']
+        st.session_state.pop('selected_os', None)
+
+def forget_checklist_job():
+    st.session_state.pop('checklist_job_id', None)
+    st.session_state.pop('checklist_job_os', None)
+
+job_os_id = st.session_state.get('checklist_job_os')
+if 'checklist_job_id' in st.session_state and st.session_state.get('selected_os_id') in (None, job_os_id):
+    # Checklist já enviado: acompanha o upload feito em segundo plano. A OS continua
+    # selecionada até o upload terminar, para que uma falha possa ser reenviada.
+    queue = get_job_queue()
+    job = queue.get(st.session_state['checklist_job_id'])
+    st.title("📤 Enviando Checklist")
+    if job is None:
+        forget_checklist_job()
+        st.rerun()
+    elif job["status"] == "failed":
+        st.error(f"O envio do checklist falhou: {job['message']}")
+        st.info("As respostas, fotos e assinaturas continuam guardadas no servidor; o envio pode ser repetido sem preencher nada de novo.")
+        col_retry, col_discard = st.columns(2)
+        if col_retry.button("🔁 Tentar novamente", type="primary"):
+            queue.retry(job["id"])
+            st.rerun()
+        if col_discard.button("✏️ Preencher o checklist de novo"):
+            # As fotos continuam em disco; itens e assinaturas são preenchidos de novo
+            st.session_state.pop('assinaturas_canvas', None)
+            forget_checklist_job()
+            st.rerun()
+    elif job["status"] == "done":
+        finish_checklist(job_os_id)
+        st.success("Checklist enviado! A OS está aguardando o suporte.")
+        for falha in (job["result"] or {}).get("falhas", []):
+            st.warning(f"Falha não crítica: {falha}")
+        if st.button("Ir para o Dashboard"):
+            forget_checklist_job()
+            st.cache_data.clear()
+            st.switch_page("pages/2_Dashboard.py")
+    else:
+        st.info("O checklist foi registrado. As fotos e assinaturas estão sendo enviadas em segundo plano; você já pode sair desta página.")
+        render_job_status(job["id"])
     st.stop()
 if 'selected_os_id' not in st.session_state:
     st.error("Nenhuma Ordem de Serviço selecionada. Volte para a lista de Ordens Pendentes.")
@@ -17,160 +78,234 @@ if 'selected_os_id' not in st.session_state:
     st.stop()
 
 # --- Conexão com Supabase ---
-@st.cache_resource
-def init_supabase_connection():
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
-supabase: Client = init_supabase_connection()
+supabase = get_supabase()
 os_id = st.session_state.selected_os_id
 
 # --- Funções ---
+@resilient_read()
 @st.cache_data(ttl=30)
 def get_os_details(os_id):
     response = supabase.table('ordens_de_servico').select("*").eq('id', os_id).single().execute()
     return response.data
 
-@st.cache_data(ttl=3600)
-def get_checklist_template(vehicle_type):
+def spooled_photos():
+    """Fotos desta OS já gravadas em disco, {chave: caminho}."""
+    return st.session_state.setdefault('fotos_em_disco', {}).setdefault(os_id, {})
+
+def spill_photo(key):
     """
-    Busca o template de checklist para um tipo de veículo.
-    CORRIGIDO: Agora não causa erro se nenhum template for encontrado.
+    Grava em disco a foto recém-tirada e tira o buffer da memória do servidor; se a foto
+    foi apagada pelo técnico, remove a anterior do disco.
     """
-    # Remove .single() para evitar um erro se nenhum template for encontrado.
-    # A query agora retornará uma lista de resultados.
-    response = supabase.table('templates_checklist').select('itens').eq('tipo_veiculo', vehicle_type).execute()
-    
-    # Verifica se a lista de resultados não está vazia.
-    if response.data:
-        # Pega o primeiro item da lista
-        template_data = response.data[0]
-        return template_data.get('itens', [])
-    
-    # Se nenhum template foi encontrado, retorna uma lista vazia.
-    return []
-
-def upload_file_to_supabase(bucket_name, file_bytes, destination_path):
-    """Faz upload de um arquivo para o Supabase Storage."""
-    try:
-        supabase.storage.from_(bucket_name).upload(
-            file=file_bytes, 
-            path=destination_path, 
-            file_options={"content-type": "image/png", "upsert": "true"}
-        )
-        res = supabase.storage.from_(bucket_name).get_public_url(destination_path)
-        return res
-    except Exception as e:
-        st.error(f"Erro no upload para o bucket '{bucket_name}': {e}")
-        return None
+    spooled = spooled_photos()
+    old_path = spooled.pop(key, None)
+    if old_path and os.path.exists(old_path):
+        os.remove(old_path)
+    foto = st.session_state.get(f"camera_{key}")
+    if foto is None:
+        return
+    spool_path = get_job_queue().spool_path(os_id, FOTOS[key][1])
+    spill_upload(foto, spool_path)
+    spooled[key] = spool_path
 
 # --- Carregar Dados ---
-os_data = get_os_details(os_id)
+# Vindo da lista de pendentes, a OS já está na sessão e os templates já estão em cache
+os_data = st.session_state.get('selected_os')
+if os_data and os_data.get('id') == os_id:
+    templates = get_all_checklist_templates()
+else:
+    # Os templates vêm todos de uma vez, então não é preciso esperar a OS para saber o tipo de veículo
+    loaded = load_concurrently("Checklist", os_data=lambda: get_os_details(os_id), templates=get_all_checklist_templates)
+    os_data, templates = loaded["os_data"], loaded["templates"]
 if not os_data:
     st.error("Não foi possível carregar os dados da Ordem de Serviço.")
     st.stop()
 
-checklist_items = get_checklist_template(os_data.get('veiculo_tipo'))
+checklist_items = templates.get(os_data.get('veiculo_tipo'), [])
 
 # --- Interface do Checklist ---
+from streamlit_drawable_canvas import st_canvas
+
 st.set_page_config(layout="wide")
 st.title(f"📝 Executando Checklist - OS: {os_id[:8]}...")
 st.info(f"**Cliente:** {os_data.get('cliente_nome')} | **Veículo:** {os_data.get('veiculo_modelo')} - {os_data.get('veiculo_placa')}")
 st.markdown("---")
 
-with st.form("checklist_form"):
-    tab1, tab2, tab3 = st.tabs(["✅ Checklist do Veículo", "📸 Fotos e ID", "🖋️ Assinaturas e Finalização"])
+# --- Seções ---
+# Fotos, assinaturas e checklist são fragmentos: tirar uma foto, enviar uma assinatura ou
+# trocar o modo da lista executa de novo só a própria seção. Os itens e os dados da
+# finalização ficam em um único formulário, então marcar um item não executa nada no
+# servidor e o que é gravado é sempre o que está na tela no momento do envio.
+@st.fragment
+@timed_section("Fotos")
+def photo_section():
+    # Cada foto vai para o disco assim que é tirada, em vez de ficar na memória do
+    # servidor até o envio (e, depois dele, até o fim da sessão)
+    foto_cols = st.columns(2)
+    for index, (key, (label, _)) in enumerate(FOTOS.items()):
+        with foto_cols[index // 2]:
+            st.camera_input(label, key=f"camera_{key}", on_change=spill_photo, args=(key,))
+            if key in spooled_photos():
+                st.caption("✅ Foto salva")
+
+ASSINATURAS = {"tecnico": "Assinatura do Instalador", "cliente": "Assinatura do Cliente"}
+
+def has_signature(canvas_data):
+    """A assinatura chegou ao servidor: o canvas enviou a imagem e ela tem pelo menos um traço."""
+    if canvas_data is None or canvas_data.image_data is None:
+        return False
+    return canvas_data.json_data is None or bool(canvas_data.json_data.get("objects"))
 
-    with tab1:
-        st.header("Itens do Veículo")
-        checklist_respostas = {}
-        if not checklist_items:
-            # Mensagem de aviso se nenhum template for encontrado
-            st.warning(f"Nenhum template de checklist encontrado para o tipo de veículo '{os_data.get('veiculo_tipo')}'. Vá ao Painel de Admin para criar um.")
-        else:
+@st.fragment
+@timed_section("Assinaturas")
+def signature_section():
+    """Canvas de assinatura; guarda os resultados em st.session_state['assinaturas_canvas']."""
+    st.subheader("Assinaturas")
+    # Sem update_streamlit, cada traço executaria a seção de novo; a assinatura só é enviada
+    # pelo botão de envio do próprio canvas
+    st.caption("Depois de assinar, toque no botão de envio abaixo do quadro para registrar a assinatura.")
+    canvases = {}
+    for col, (key, label) in zip(st.columns(2), ASSINATURAS.items()):
+        with col:
+            st.write(label)
+            canvases[key] = st_canvas(height=150, width=400, drawing_mode="freedraw", update_streamlit=False, key=f"canvas_{key}")
+            if has_signature(canvases[key]):
+                st.caption("✅ Assinatura recebida")
+    st.session_state['assinaturas_canvas'] = canvases
+
+# Templates grandes (caminhões, máquinas) ficam leves em uma única grade em vez de um widget por item
+GRID_THRESHOLD = 30
+
+@st.fragment
+@timed_section("Checklist")
+def checklist_section(checklist_items):
+    """Itens do veículo e dados da finalização, enviados juntos pelo botão de finalizar."""
+    st.header("Itens do Veículo")
+    grid_mode = False
+    if not checklist_items:
+        # Mensagem de aviso se nenhum template for encontrado
+        st.warning(f"Nenhum template de checklist encontrado para o tipo de veículo '{os_data.get('veiculo_tipo')}'. Vá ao Painel de Admin para criar um.")
+    else:
+        grid_mode = st.toggle(
+            "Modo grade (compacto)",
+            value=len(checklist_items) > GRID_THRESHOLD,
+            help="Todos os itens começam como intactos; marque apenas os defeitos e as observações."
+        )
+    with st.form("checklist_form"):
+        if checklist_items and grid_mode:
+            st.write(f"{len(checklist_items)} itens, todos intactos por padrão. Marque os defeitos e anote o que for necessário.")
+            grade = st.data_editor(
+                [{"Item": item, "Defeito": False, "Observação": ""} for item in checklist_items],
+                column_config={
+                    "Item": st.column_config.TextColumn(disabled=True),
+                    "Defeito": st.column_config.CheckboxColumn(default=False),
+                    "Observação": st.column_config.TextColumn(),
+                },
+                hide_index=True,
+                num_rows="fixed",
+                width="stretch",
+                key="checklist_grid"
+            )
+        elif checklist_items:
             st.write("Marque o estado de cada item.")
-            for item in checklist_items:
-                checklist_respostas[item] = st.radio(item, ["Intacto", "Defeito"], horizontal=True, key=f"check_{item}")
-
-    with tab2:
-        st.header("Registros Fotográficos e ID")
-        col1, col2 = st.columns(2)
-        with col1:
-            rastreador_id = st.text_input("ID do Rastreador Principal Instalado", value=os_data.get('rastreador_id', ''))
-            foto_placa = st.camera_input("Foto da Placa do Veículo")
-            foto_local_instalacao = st.camera_input("Foto do Local de Instalação")
-        with col2:
-            foto_rastreador = st.camera_input("Foto do Rastreador (Número de Série)")
-            foto_extra = st.camera_input("Foto Extra (Opcional)")
-
-    with tab3:
+            respostas = {item: st.radio(item, [INTACTO, DEFEITO], horizontal=True, key=f"check_{item}") for item in checklist_items}
+
         st.header("Finalização do Serviço")
+        rastreador_id = st.text_input("ID do Rastreador Principal Instalado", value=os_data.get('rastreador_id', ''))
         observacoes = st.text_area("Observações Gerais", height=150)
         bloqueio_instalado = st.toggle("Bloqueio foi instalado/ativado?", value=False)
-        st.subheader("Assinaturas")
-        col_sig1, col_sig2 = st.columns(2)
-        with col_sig1:
-            st.write("Assinatura do Instalador")
-            assinatura_tecnico = st_canvas(height=150, width=400, drawing_mode="freedraw", key="canvas_tecnico")
-        with col_sig2:
-            st.write("Assinatura do Cliente")
-            assinatura_cliente = st_canvas(height=150, width=400, drawing_mode="freedraw", key="canvas_cliente")
+        submitted = st.form_submit_button("Salvar e Finalizar Serviço", type="primary")
+    if not submitted:
+        return
 
-    submitted = st.form_submit_button("Salvar e Finalizar Serviço", type="primary")
+    canvases = st.session_state.get('assinaturas_canvas', {})
+    missing = [label for key, label in ASSINATURAS.items() if not has_signature(canvases.get(key))]
+    if missing:
+        st.error(f"Não recebida: {', '.join(missing)}. Na aba 'Assinaturas', assine e toque no botão de envio abaixo do quadro antes de finalizar.")
+        return
+
+    defeitos = {}
+    notas = {}
+    if checklist_items and grid_mode:
+        for row in grade:
+            if row["Defeito"]:
+                defeitos[row["Item"]] = row["Observação"] or ""
+            elif row["Observação"]:
+                notas[row["Item"]] = row["Observação"]
+    elif checklist_items:
+        defeitos = {item: "" for item, resposta in respostas.items() if resposta == DEFEITO}
+    submit_checklist(
+        checklist_respostas=encode_sparse(checklist_items, defeitos, notas),
+        rastreador_id=rastreador_id,
+        observacoes=observacoes,
+        bloqueio_instalado=bloqueio_instalado,
+    )
 
 # --- Lógica de Submissão ---
-if submitted:
-    with st.spinner("Salvando dados e fazendo upload..."):
-        fotos_urls = {}
-        assinaturas_urls = {}
-        
-        if foto_placa:
-            url = upload_file_to_supabase("fotos_os", foto_placa.getvalue(), f"{os_id}/placa.png")
-            if url: fotos_urls["placa"] = url
-        if foto_local_instalacao:
-            url = upload_file_to_supabase("fotos_os", foto_local_instalacao.getvalue(), f"{os_id}/local_instalacao.png")
-            if url: fotos_urls["local"] = url
-        if foto_rastreador:
-            url = upload_file_to_supabase("fotos_os", foto_rastreador.getvalue(), f"{os_id}/rastreador.png")
-            if url: fotos_urls["rastreador"] = url
-        if foto_extra:
-            url = upload_file_to_supabase("fotos_os", foto_extra.getvalue(), f"{os_id}/extra.png")
-            if url: fotos_urls["extra"] = url
-
-        def process_signature(canvas_data, bucket, path):
-            if canvas_data.image_data is not None:
-                img = Image.fromarray(canvas_data.image_data.astype('uint8'), 'RGBA')
-                buffer = io.BytesIO()
-                img.save(buffer, format="PNG")
-                return upload_file_to_supabase(bucket, buffer.getvalue(), path)
-            return None
-
-        url_sig_tecnico = process_signature(assinatura_tecnico, "assinaturas", f"{os_id}/tecnico.png")
-        if url_sig_tecnico: assinaturas_urls["tecnico"] = url_sig_tecnico
-        
-        url_sig_cliente = process_signature(assinatura_cliente, "assinaturas", f"{os_id}/cliente.png")
-        if url_sig_cliente: assinaturas_urls["cliente"] = url_sig_cliente
-
-        update_data = {
-            "checklist_respostas": json.dumps(checklist_respostas),
-            "rastreador_id": rastreador_id,
-            "observacoes": observacoes,
-            "bloqueio_instalado": bloqueio_instalado,
-            "status": "Aguardando Suporte",
-            "data_finalizacao": datetime.now().isoformat(),
-            "fotos_urls": json.dumps(fotos_urls),
-            "assinaturas_urls": json.dumps(assinaturas_urls)
-        }
-        
+# Os arquivos vão para o disco e o upload roda na fila de tarefas, sem prender a sessão.
+def submit_checklist(**fields):
+    with st.spinner("Preparando o envio..."):
+        queue = get_job_queue()
+        files = []
+
+        # As fotos já estão em disco desde que foram tiradas
+        for key, spool_path in spooled_photos().items():
+            filename = FOTOS[key][1]
+            files.append({"group": "fotos", "key": key, "bucket": "fotos_os", "path": f"{os_id}/{filename}",
+                          "spool_path": spool_path, "keep_transparency": False})
+
+        def process_signature(canvas_data, key):
+            # O canvas já devolve uint8: sem cópia no astype, e o PNG vai direto para o disco
+            img = Image.fromarray(canvas_data.image_data.astype('uint8', copy=False))
+            spool_path = queue.spool_path(os_id, f"{key}.png")
+            img.save(spool_path, format="PNG")
+            files.append({"group": "assinaturas", "key": key, "bucket": "assinaturas", "path": f"{os_id}/{key}.png",
+                          "spool_path": spool_path, "keep_transparency": True})
+
+        for key, canvas_data in st.session_state['assinaturas_canvas'].items():
+            process_signature(canvas_data, key)
+        # Com os PNGs em disco, os arrays RGBA dos canvas não são mais necessários: um novo
+        # envio usa os arquivos do spool
+        st.session_state.pop('assinaturas_canvas')
+        for key in ASSINATURAS:
+            st.session_state.pop(f"canvas_{key}", None)
+
+        update_data = status_update(
+            AGUARDANDO_SUPORTE,
+            st.session_state.get('user_id'),
+            data_finalizacao=datetime.now().isoformat(),
+            **fields,
+        )
+
         try:
-            supabase.table('ordens_de_servico').update(update_data).eq('id', os_id).execute()
-            st.success("Serviço finalizado e dados salvos com sucesso!")
-            st.balloons()
-            del st.session_state['selected_os_id']
-            st.cache_data.clear()
-            import time
-            time.sleep(3)
-            st.switch_page("pages/2_Dashboard.py")
+            job_id = queue.enqueue(
+                "upload_checklist",
+                {"os_id": os_id, "update_data": update_data, "files": files, "spool_dir": queue.spool_path(os_id)},
+                owner=st.session_state.get('user_id')
+            )
+            st.session_state['checklist_job_id'] = job_id
+            st.session_state['checklist_job_os'] = os_id
+            log_session_memory("Checklist")
+            # Os dados do checklist só saem da sessão quando o upload terminar (finish_checklist)
+            st.rerun()
         except Exception as e:
-            st.error(f"Erro ao salvar no banco de dados: {e}")
+            st.error(f"Erro ao registrar o envio do checklist: {e}")
+
+tab_fotos, tab_assinaturas, tab_checklist = st.tabs(["📸 Registros Fotográficos", "🖋️ Assinaturas", "✅ Checklist e Finalização"])
+with tab_fotos:
+    photo_section()
+with tab_assinaturas:
+    signature_section()
+with tab_checklist:
+    checklist_section(checklist_items)
+
+# --- Memória da Sessão ---
+if user_info.get('nivel_acesso') in ['gestor', 'admin']:
+    with st.sidebar.expander("🧠 Memória desta sessão"):
+        report = session_memory_report()
+        st.metric("Total estimado", f"{report['total_bytes'] / 1024:.0f} KB")
+        st.caption(f"Uploads na memória do servidor: {report['uploads']} ({report['uploads_bytes'] / 1024:.0f} KB)")
+        st.dataframe(
+            [{"Chave": key, "KB": round(size / 1024, 1)} for key, size in report['chaves'].items()],
+            hide_index=True
+        )
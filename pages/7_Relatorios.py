@@ -1,44 +1,85 @@
 import streamlit as st
-from supabase import create_client, Client
-import pandas as pd
 from datetime import datetime, timedelta
-from io import BytesIO
+import hashlib
+import os
+from utils.bootstrap import get_job_queue, get_supabase, lazy_import, render_job_status, require_login
+from utils.export import EXPORT_FORMATS, report_row
+from utils.resilience import resilient_read
+from utils.transitions import AGUARDANDO_SUPORTE, EM_ANDAMENTO, PENDENTE, SEM_USUARIO, format_duration, summarize_rollups
 
-# --- Verificação de Login e Permissão ---
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("Você precisa estar logado para acessar esta página.")
-    st.stop()
+pd = lazy_import("pandas")
 
-user_info = st.session_state.get('user_info', {})
+# --- Verificação de Login e Permissão ---
+user_info = require_login(['gestor', 'admin'])
 access_level = user_info.get('nivel_acesso')
 
-if access_level not in ['gestor', 'admin']:
-    st.error("Você não tem permissão para acessar esta página.")
-    st.stop()
-
 # --- Conexão com Supabase ---
-@st.cache_resource
-def init_supabase_connection():
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
-supabase: Client = init_supabase_connection()
+supabase = get_supabase()
 
 # --- Funções ---
+@resilient_read()
 @st.cache_data(ttl=300)
 def fetch_finalized_os(start_date, end_date):
     """Busca OS finalizadas dentro de um período."""
     response = supabase.table('ordens_de_servico').select("*").eq('status', 'Finalizada').gte('data_finalizacao', start_date.isoformat()).lte('data_finalizacao', end_date.isoformat()).execute()
     return response.data
 
-def to_excel(df):
-    """Converte um DataFrame para um arquivo Excel em memória."""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Relatorio_OS')
-    processed_data = output.getvalue()
-    return processed_data
+@resilient_read()
+@st.cache_data(ttl=60)
+def get_data_version(start_date, end_date):
+    """
+    Versão dos dados do período: quantidade de OS finalizadas e a finalização mais recente.
+    Muda quando uma OS do período é finalizada, o que invalida as exportações anteriores.
+    """
+    response = supabase.table('ordens_de_servico').select('data_finalizacao', count='exact').eq('status', 'Finalizada').gte('data_finalizacao', start_date.isoformat()).lte('data_finalizacao', end_date.isoformat()).order('data_finalizacao', desc=True).limit(1).execute()
+    latest = response.data[0]['data_finalizacao'] if response.data else None
+    return response.count or 0, latest
+
+@st.cache_resource
+def get_export_jobs():
+    """Tarefas de exportação já geradas, por (início, fim, formato, versão), compartilhadas entre sessões."""
+    return {}
+
+def find_export_job(cache_key):
+    """Reaproveita a tarefa do mesmo período, formato e versão, se ainda não falhou nem foi expurgada."""
+    job_id = get_export_jobs().get(cache_key)
+    if job_id is None:
+        return None
+    job = get_job_queue().get(job_id)
+    if job is None or job['status'] == 'failed' or (job['status'] == 'done' and not os.path.exists((job['result'] or {}).get('artifact_path', ''))):
+        get_export_jobs().pop(cache_key, None)
+        return None
+    return job_id
+
+@resilient_read()
+@st.cache_data(ttl=300)
+def fetch_status_rollups(start_date, end_date):
+    """Agregado diário de tempo em cada status (mantido pelo banco a cada transição)."""
+    response = supabase.table('os_tempo_status_diario').select("*").gte('dia', start_date.isoformat()).lte('dia', end_date.isoformat()).execute()
+    return response.data
+
+@resilient_read()
+@st.cache_data(ttl=600)
+def get_user_names():
+    response = supabase.table('usuarios').select('id, nome').execute()
+    return {item['id']: item['nome'] for item in response.data}
+
+def sla_table(summary, label, names=None):
+    """Linhas da tabela de SLA a partir do resumo por grupo."""
+    rows = []
+    for key, stats in sorted(summary.items(), key=lambda item: -item[1]['quantidade']):
+        name = key[-1]
+        if names is not None:
+            name = "Sem responsável" if name == SEM_USUARIO else names.get(name, name[:8])
+        rows.append({
+            label: name,
+            "Transições": stats['quantidade'],
+            "Média": format_duration(stats['media']),
+            "p50": format_duration(stats['p50']),
+            "p90": format_duration(stats['p90']),
+            "p95": format_duration(stats['p95']),
+        })
+    return rows
 
 # --- Interface ---
 st.set_page_config(layout="wide")
@@ -63,15 +104,9 @@ data = fetch_finalized_os(start_date, end_date)
 if not data:
     st.warning("Nenhum dado encontrado para o período selecionado.")
 else:
-    df = pd.DataFrame(data)
-    
-    # --- Limpeza e Preparação dos Dados ---
-    # Converte colunas de data
-    df['created_at'] = pd.to_datetime(df['created_at']).dt.strftime('%d/%m/%Y %H:%M')
-    df['data_finalizacao'] = pd.to_datetime(df['data_finalizacao']).dt.strftime('%d/%m/%Y %H:%M')
-    
-    # Remove colunas desnecessárias para o relatório principal
-    df_display = df.drop(columns=['checklist_respostas', 'fotos_urls', 'assinaturas_urls'], errors='ignore')
+    # Datas formatadas, quantidade de defeitos (formato completo ou esparso do checklist)
+    # e sem as colunas de JSON e URLs; as mesmas linhas usadas na exportação
+    df = pd.DataFrame([report_row(row) for row in data])
 
     st.markdown("---")
     st.header("Visão Geral")
@@ -93,13 +128,115 @@ else:
     
     st.markdown("---")
     st.header("Dados Detalhados")
-    st.dataframe(df_display)
+    st.dataframe(df)
     
     # --- Exportação ---
-    excel_data = to_excel(df_display)
-    st.download_button(
-        label="📥 Exportar para Excel (.xlsx)",
-        data=excel_data,
-        file_name=f"relatorio_os_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    # O arquivo só é gerado quando solicitado, na fila de tarefas, e fica disponível para
+    # qualquer usuário que peça o mesmo período e formato enquanto os dados não mudarem
+    data_version = get_data_version(start_date, end_date)
+    st.subheader("Exportar Dados")
+    fmt = st.radio("Formato", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f]['label'], horizontal=True, key="export_format")
+    export_key = (start_date.isoformat(), end_date.isoformat(), fmt, data_version)
+    export_job_id = find_export_job(export_key)
+    if export_job_id:
+        render_job_status(export_job_id, f"📥 Baixar {EXPORT_FORMATS[fmt]['label']}", key=f"download_export_{fmt}")
+    elif st.button(f"📊 Gerar {EXPORT_FORMATS[fmt]['label']}"):
+        get_export_jobs()[export_key] = get_job_queue().enqueue(
+            "export",
+            {"start_date": start_date.isoformat(), "end_date": end_date.isoformat(), "fmt": fmt, "total": data_version[0]},
+            owner=st.session_state.get('user_id')
+        )
+        st.rerun()
+
+    # --- Exportação em Lote (PDF) ---
+    st.markdown("---")
+    st.header("Relatórios em PDF")
+    st.write(f"Gera um relatório em PDF, com fotos e assinaturas, para cada uma das **{len(data)}** OS do período, compactados em um único arquivo ZIP.")
+
+    # Gerado na fila de tarefas, como as exportações acima; um pool de processos por exportação
+    pdf_key = f"pdf_job_{hashlib.sha1(','.join(sorted(row['id'] for row in data)).encode()).hexdigest()[:12]}"
+    if st.session_state.get(pdf_key):
+        render_job_status(st.session_state[pdf_key], "📥 Baixar PDFs (.zip)", key=f"download_{pdf_key}")
+        pdf_job = get_job_queue().get(st.session_state[pdf_key])
+        stats = ((pdf_job or {}).get('result') or {}).get('estatisticas')
+        if stats:
+            stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
+            with stat_col1:
+                st.metric("PDFs Gerados", f"{stats['gerados']}/{stats['total']}")
+            with stat_col2:
+                st.metric("Vazão", f"{stats['pdfs_por_segundo']:.1f} PDF/s", f"{stats['mb_por_segundo']:.2f} MB/s", delta_color="off")
+            with stat_col3:
+                st.metric("Tempo Total", f"{stats['segundos']:.1f} s")
+            with stat_col4:
+                if stats['pico_memoria_worker_mb'] is not None:
+                    st.metric("Pico de Memória por Worker", f"{stats['pico_memoria_worker_mb']:.0f} MB", f"todos os workers: {stats['pico_memoria_workers_mb']:.0f} MB", delta_color="off")
+            if stats['falhas']:
+                st.warning(f"{len(stats['falhas'])} OS não puderam ser exportadas: " + ", ".join(f['id'][:8] for f in stats['falhas']))
+    elif st.button("📦 Gerar PDFs do Período"):
+        st.session_state[pdf_key] = get_job_queue().enqueue(
+            "pdfs",
+            {"os_list": data, "filename": f"relatorios_os_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.zip"},
+            owner=st.session_state.get('user_id')
+        )
+        st.rerun()
+
+    # --- Exportação de Evidências (Fotos e Assinaturas) ---
+    st.markdown("---")
+    st.header("🗂️ Evidências (Fotos e Assinaturas)")
+    st.write("Baixa as fotos e assinaturas das OS selecionadas em um único ZIP, organizado por placa e OS, com um manifesto (`manifesto.csv`) listando cada arquivo.")
+
+    ev_col1, ev_col2 = st.columns(2)
+    with ev_col1:
+        clientes = st.multiselect("Clientes (frota)", sorted({row['cliente_nome'] for row in data if row.get('cliente_nome')}), placeholder="Todos", key="evidence_clientes")
+    with ev_col2:
+        placas_disponiveis = sorted({row['veiculo_placa'] for row in data if row.get('veiculo_placa') and (not clientes or row.get('cliente_nome') in clientes)})
+        placas = st.multiselect("Placas", placas_disponiveis, placeholder="Todas", key="evidence_placas")
+
+    evidence_os = [
+        {key: row.get(key) for key in ('id', 'veiculo_placa', 'cliente_nome', 'fotos_urls', 'assinaturas_urls')}
+        for row in data
+        if (not clientes or row.get('cliente_nome') in clientes) and (not placas or row.get('veiculo_placa') in placas)
+    ]
+    st.caption(f"{len(evidence_os)} OS selecionadas.")
+
+    evidence_key = f"evidence_job_{hashlib.sha1(','.join(sorted(o['id'] for o in evidence_os)).encode()).hexdigest()[:12]}"
+    if st.session_state.get(evidence_key):
+        render_job_status(st.session_state[evidence_key], "📥 Baixar Evidências (.zip)", key=f"download_{evidence_key}")
+        evidence_job = get_job_queue().get(st.session_state[evidence_key])
+        evidence_stats = ((evidence_job or {}).get('result') or {}).get('estatisticas')
+        if evidence_stats:
+            st.caption(f"{evidence_stats['baixados']}/{evidence_stats['arquivos']} arquivos, {evidence_stats['bytes'] / 1024 / 1024:.1f} MB em {evidence_stats['segundos']:.1f} s ({evidence_stats['mb_por_segundo']:.1f} MB/s).")
+            if evidence_stats['falhas']:
+                st.warning(f"{evidence_stats['falhas']} arquivos não puderam ser baixados; veja a coluna 'erro' do manifesto.")
+    elif st.button("🗂️ Gerar ZIP de Evidências", disabled=not evidence_os):
+        st.session_state[evidence_key] = get_job_queue().enqueue(
+            "evidencias",
+            {"os_list": evidence_os, "filename": f"evidencias_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.zip"},
+            owner=st.session_state.get('user_id')
+        )
+        st.rerun()
+
+# --- SLA: Tempo em Cada Status ---
+st.markdown("---")
+st.header("⏱️ Tempo em Cada Status (SLA)")
+st.caption("Calculado a partir do histórico de mudanças de status. Os percentis são aproximados pelas faixas do histograma.")
+
+rollups = fetch_status_rollups(start_date, end_date)
+if not rollups:
+    st.info("Nenhuma mudança de status registrada no período.")
+else:
+    user_names = get_user_names()
+    st.subheader("Por Status")
+    st.dataframe(sla_table(summarize_rollups(rollups, ('status',)), "Status"), hide_index=True)
+
+    sla_col1, sla_col2 = st.columns(2)
+    with sla_col1:
+        st.subheader("Por Técnico")
+        status_tecnico = st.selectbox("Status", [PENDENTE, EM_ANDAMENTO], key="sla_status_tecnico")
+        tecnico_rows = [r for r in rollups if r['status'] == status_tecnico]
+        st.dataframe(sla_table(summarize_rollups(tecnico_rows, ('tecnico_id',)), "Técnico", user_names), hide_index=True)
+    with sla_col2:
+        st.subheader("Por Agente de Suporte")
+        st.caption(f"Tempo em '{AGUARDANDO_SUPORTE}' até a finalização.")
+        suporte_rows = [r for r in rollups if r['status'] == AGUARDANDO_SUPORTE]
+        st.dataframe(sla_table(summarize_rollups(suporte_rows, ('suporte_id',)), "Agente", user_names), hide_index=True)
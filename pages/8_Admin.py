@@ -1,44 +1,33 @@
 import streamlit as st
-from supabase import create_client, Client
-import pandas as pd
+from utils.bootstrap import get_supabase, require_login
+from utils.resilience import get_executor, resilient_read
+from utils.shared_cache import TECNICOS, invalidate
 
 # --- Verificação de Login e Permissão ---
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("Você precisa estar logado para acessar esta página.")
-    st.stop()
-
-user_info = st.session_state.get('user_info', {})
+user_info = require_login(['admin'], denied_message="Acesso restrito a administradores.")
 access_level = user_info.get('nivel_acesso')
 
-if access_level != 'admin':
-    st.error("Acesso restrito a administradores.")
-    st.stop()
-
 # --- Conexão com Supabase ---
 
-# Conexão padrão para leitura (usa a chave anônima pública)
-@st.cache_resource
-def init_supabase_connection():
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
 # CONEXÃO DE ADMIN (usa a chave de serviço secreta)
 def get_admin_supabase_client():
     """Cria um cliente Supabase com permissões de administrador."""
+    from supabase import create_client
+    from utils.resilience import client_options
+
     try:
         url = st.secrets["supabase"]["url"]
         service_key = st.secrets["supabase"]["service_key"]
-        return create_client(url, service_key)
+        return create_client(url, service_key, options=client_options())
     except Exception as e:
         st.error("A chave de serviço (service_key) não foi encontrada nos segredos. Operações de administrador estão desativadas.")
         st.error(e)
         return None
 
 # Cliente para operações de leitura geral
-supabase_anon: Client = init_supabase_connection()
+supabase_anon = get_supabase()
 # Cliente para operações de escrita/modificação de administrador
-supabase_admin: Client = get_admin_supabase_client()
+supabase_admin = get_admin_supabase_client()
 
 # --- Funções de Admin ---
 
@@ -46,7 +35,7 @@ def create_user(email, password, name, level):
     if not supabase_admin: return False, "Cliente de admin não inicializado."
     try:
         # Usa o cliente admin para criar o usuário na autenticação
-        res = supabase_admin.auth.admin.create_user({
+        res = get_executor().call("supabase", supabase_admin.auth.admin.create_user, {
             "email": email,
             "password": password,
             "email_confirm": True
@@ -62,8 +51,9 @@ def create_user(email, password, name, level):
                 "is_active": True
             }
             # Usa o cliente admin para inserir o perfil no banco de dados
-            supabase_admin.table('usuarios').insert(user_profile_data).execute()
+            get_executor().call("supabase", supabase_admin.table('usuarios').insert(user_profile_data).execute)
             st.cache_data.clear()
+            invalidate(TECNICOS)
             return True, "Usuário criado com sucesso!"
         else:
             return False, "Não foi possível criar o usuário na autenticação."
@@ -80,15 +70,16 @@ def update_user(user_id, new_name, new_level, new_email, new_password):
         
         if auth_updates:
             # Usa o cliente admin para atualizar e-mail/senha
-            supabase_admin.auth.admin.update_user_by_id(user_id, auth_updates)
+            get_executor().call("supabase", supabase_admin.auth.admin.update_user_by_id, user_id, auth_updates, idempotent=True)
 
         profile_updates = {"nome": new_name, "nivel_acesso": new_level}
         if new_email: profile_updates['email'] = new_email
 
         # Usa o cliente admin para atualizar o perfil
-        supabase_admin.table('usuarios').update(profile_updates).eq('id', user_id).execute()
+        get_executor().call("supabase", supabase_admin.table('usuarios').update(profile_updates).eq('id', user_id).execute, idempotent=True)
         
         st.cache_data.clear()
+        invalidate(TECNICOS)
         return True, "Usuário atualizado com sucesso!"
     except Exception as e:
         return False, str(e)
@@ -98,12 +89,14 @@ def toggle_user_status(user_id, current_status):
     try:
         new_status = not current_status
         # Usa o cliente admin para ativar/desativar
-        supabase_admin.table('usuarios').update({"is_active": new_status}).eq('id', user_id).execute()
+        get_executor().call("supabase", supabase_admin.table('usuarios').update({"is_active": new_status}).eq('id', user_id).execute, idempotent=True)
         st.cache_data.clear()
+        invalidate(TECNICOS)
         return True, f"Usuário {'ativado' if new_status else 'desativado'} com sucesso!"
     except Exception as e:
         return False, str(e)
 
+@resilient_read()
 @st.cache_data(ttl=60)
 def get_all_users():
     # Para ler dados, o cliente anônimo é suficiente
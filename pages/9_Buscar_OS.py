@@ -0,0 +1,94 @@
+import streamlit as st
+import time
+from utils.bootstrap import get_supabase, require_login
+from utils.resilience import resilient_read
+from utils.search import MIN_TERM_LENGTH, normalize_query, query_terms, search_supabase
+
+# --- Verificação de Login e Permissão ---
+user_info = require_login(['suporte', 'gestor', 'admin'])
+
+# --- Conexão com Supabase ---
+supabase = get_supabase()
+
+PAGE_SIZE = 20
+STATUS_ICONES = {
+    "Pendente": "🕒 Pendente",
+    "Em Andamento": "🔧 Em Andamento",
+    "Aguardando Suporte": "📨 Aguardando Suporte",
+    "Finalizada": "✅ Finalizada",
+}
+
+# --- Funções ---
+@resilient_read()
+@st.cache_data(ttl=60, max_entries=500)
+def search_orders(normalized, page):
+    """Uma página de resultados. O cache é compartilhado entre as sessões do processo."""
+    return search_supabase(supabase, normalized, PAGE_SIZE, page * PAGE_SIZE)
+
+def reset_page():
+    st.session_state['busca_pagina'] = 0
+
+# --- Interface ---
+st.set_page_config(layout="wide")
+st.title("🔎 Buscar Ordem de Serviço")
+st.markdown("Busque por placa, nome do cliente, ID do rastreador ou endereço, em todos os status.")
+
+# O campo só dispara a busca ao pressionar Enter ou sair dele, e não a cada tecla digitada;
+# a normalização faz variações de maiúsculas e espaços reaproveitarem o mesmo resultado em cache.
+termo = st.text_input(
+    "Buscar",
+    key="busca_termo",
+    placeholder="Ex.: ABC1D23, João da Silva, 86012345...",
+    on_change=reset_page,
+    label_visibility="collapsed"
+)
+normalized = normalize_query(termo)
+page = st.session_state.setdefault('busca_pagina', 0)
+
+if not normalized:
+    st.stop()
+if not query_terms(normalized):
+    st.info(f"Digite ao menos {MIN_TERM_LENGTH} caracteres para buscar.")
+    st.stop()
+
+start = time.perf_counter()
+try:
+    rows, has_next = search_orders(normalized, page)
+except Exception as e:
+    st.error(f"Erro ao buscar ordens de serviço: {e}")
+    st.stop()
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+if not rows:
+    st.warning("Nenhuma Ordem de Serviço encontrada." if page == 0 else "Não há mais resultados.")
+else:
+    first = page * PAGE_SIZE + 1
+    st.caption(f"Resultados {first}–{first + len(rows) - 1} · {elapsed_ms:.0f} ms")
+    st.dataframe(
+        [
+            {
+                "OS": row['id'][:8],
+                "Status": STATUS_ICONES.get(row.get('status'), row.get('status')),
+                "Placa": row.get('veiculo_placa'),
+                "Veículo": row.get('veiculo_modelo'),
+                "Cliente": row.get('cliente_nome'),
+                "Endereço": row.get('cliente_endereco'),
+                "Rastreador": row.get('rastreador_id'),
+                "Técnico": row.get('tecnico_nome'),
+                "Criada em": (row.get('created_at') or '')[:16].replace('T', ' '),
+            }
+            for row in rows
+        ],
+        hide_index=True,
+        width="stretch"
+    )
+
+nav_col1, nav_col2, _ = st.columns([1, 1, 6])
+with nav_col1:
+    if st.button("⬅️ Anterior", disabled=page == 0):
+        st.session_state['busca_pagina'] = page - 1
+        st.rerun()
+with nav_col2:
+    if st.button("Próxima ➡️", disabled=not has_next):
+        st.session_state['busca_pagina'] = page + 1
+        st.rerun()
@@ -0,0 +1,132 @@
+"""
+Gera as miniaturas das OS antigas, criadas antes de o checklist passar a salvá-las.
+
+Uso (a partir da raiz do projeto, com o .streamlit/secrets.toml configurado):
+
+    python scripts/backfill_thumbnails.py [--dry-run] [--limit N] [--batch-size N]
+
+Exige a `service_key` (exceto em --dry-run): com a chave anônima o RLS faz o upload e a
+atualização das OS falharem ou não alterarem nenhuma linha.
+"""
+import argparse
+import json
+import os
+import sys
+
+import requests
+import streamlit as st
+from supabase import create_client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.thumbnails import make_thumbnail, thumbnail_path  # noqa: E402
+
+IMAGE_TIMEOUT = 30
+
+
+def get_client(dry_run):
+    config = st.secrets["supabase"]
+    if not config.get("service_key") and not dry_run:
+        sys.exit("A service_key não foi encontrada em [supabase] nos segredos; ela é necessária para gravar as miniaturas.")
+    return create_client(config["url"], config.get("service_key") or config["key"])
+
+
+def storage_path(public_url, bucket):
+    """Extrai o caminho do objeto a partir da URL pública: .../object/public/<bucket>/<caminho>"""
+    marker = f"/object/public/{bucket}/"
+    if marker not in public_url:
+        return None
+    return public_url.split(marker, 1)[1].split("?", 1)[0]
+
+
+def build_thumbnails(supabase, http, bucket, urls, keep_transparency):
+    """Baixa cada imagem original, gera a miniatura e a envia ao lado do original."""
+    thumbs = {}
+    for key, url in urls.items():
+        path = storage_path(url, bucket)
+        if not path:
+            print(f"  - {key}: URL fora do bucket '{bucket}', ignorada")
+            continue
+        try:
+            response = http.get(url, timeout=IMAGE_TIMEOUT)
+            response.raise_for_status()
+            thumb_bytes, content_type = make_thumbnail(response.content, keep_transparency)
+            destination = thumbnail_path(path, keep_transparency)
+            supabase.storage.from_(bucket).upload(
+                file=thumb_bytes,
+                path=destination,
+                file_options={"content-type": content_type, "upsert": "true"}
+            )
+            thumbs[key] = supabase.storage.from_(bucket).get_public_url(destination)
+        except Exception as e:
+            print(f"  - {key}: falha ({e})")
+    return thumbs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Apenas lista as OS que seriam processadas.")
+    parser.add_argument("--limit", type=int, default=None, help="Número máximo de OS a processar.")
+    parser.add_argument("--batch-size", type=int, default=100, help="OS buscadas por consulta.")
+    args = parser.parse_args()
+
+    supabase = get_client(args.dry_run)
+    http = requests.Session()
+    processed = 0
+    offset = 0
+
+    while args.limit is None or processed < args.limit:
+        response = supabase.table('ordens_de_servico') \
+            .select('id, fotos_urls, assinaturas_urls') \
+            .is_('fotos_miniaturas_urls', 'null') \
+            .not_.is_('fotos_urls', 'null') \
+            .order('created_at') \
+            .range(offset, offset + args.batch_size - 1) \
+            .execute()
+        if not response.data:
+            break
+
+        updated = 0
+        skipped = 0
+        for os_row in response.data:
+            if args.limit is not None and processed >= args.limit:
+                break
+            processed += 1
+            print(f"OS {os_row['id'][:8]}...")
+            if args.dry_run:
+                continue
+
+            fotos = json.loads(os_row.get('fotos_urls') or '{}')
+            assinaturas = json.loads(os_row.get('assinaturas_urls') or '{}')
+            fotos_thumbs = build_thumbnails(supabase, http, "fotos_os", fotos, False)
+            assinaturas_thumbs = build_thumbnails(supabase, http, "assinaturas", assinaturas, True)
+            if not fotos_thumbs and not assinaturas_thumbs:
+                # Gravar '{}' tiraria a OS do filtro e uma falha passageira nunca seria refeita
+                skipped += 1
+                print("  - nenhuma miniatura gerada; a OS fica para a próxima execução")
+                continue
+            update_data = {
+                "fotos_miniaturas_urls": json.dumps(fotos_thumbs),
+                "assinaturas_miniaturas_urls": json.dumps(assinaturas_thumbs),
+            }
+            result = supabase.table('ordens_de_servico').update(update_data).eq('id', os_row['id']).execute()
+            if result.data:
+                updated += 1
+            else:
+                skipped += 1
+                print("  - OS não atualizada (sem permissão ou removida); será ignorada")
+
+        # As OS atualizadas saem do filtro; as demais (sem miniaturas ou não atualizadas)
+        # continuam nele e a janela precisa passar por elas (em dry-run, por todas)
+        if args.dry_run:
+            offset += len(response.data)
+            continue
+        offset += skipped
+        if not updated:
+            print("Nenhuma OS do lote foi atualizada; interrompendo.")
+            break
+
+    print(f"{processed} OS processada(s).")
+
+
+if __name__ == "__main__":
+    main()
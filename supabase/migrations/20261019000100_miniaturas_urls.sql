@@ -0,0 +1,5 @@
+-- URLs das miniaturas geradas no envio do checklist, ao lado de fotos_urls / assinaturas_urls.
+-- Mesmo formato das colunas originais: JSON salvo como texto, com as mesmas chaves.
+alter table public.ordens_de_servico
+    add column if not exists fotos_miniaturas_urls text,
+    add column if not exists assinaturas_miniaturas_urls text;
@@ -0,0 +1,21 @@
+-- Busca por placa, cliente, ID do rastreador e endereço (pages/9_Buscar_OS.py).
+-- Uma coluna gerada concentra os quatro campos em minúsculas e um único índice GIN
+-- trigram atende aos filtros ILIKE '%termo%' de qualquer um deles.
+create extension if not exists pg_trgm;
+
+alter table public.ordens_de_servico
+    add column if not exists busca_texto text generated always as (
+        lower(
+            coalesce(veiculo_placa, '') || ' ' ||
+            coalesce(cliente_nome, '') || ' ' ||
+            coalesce(rastreador_id, '') || ' ' ||
+            coalesce(cliente_endereco, '')
+        )
+    ) stored;
+
+create index if not exists ordens_de_servico_busca_texto_trgm
+    on public.ordens_de_servico using gin (busca_texto gin_trgm_ops);
+
+-- Ordenação dos resultados paginados
+create index if not exists ordens_de_servico_created_at
+    on public.ordens_de_servico (created_at desc);
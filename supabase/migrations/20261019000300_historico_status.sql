@@ -0,0 +1,182 @@
+-- Histórico de mudanças de status das OS e tempo em cada status.
+--
+-- Toda mudança de status (em qualquer cliente) gera uma linha em os_status_transicoes por
+-- trigger. Cada transição soma a duração do status que terminou em os_tempo_status_diario,
+-- agregada por dia, status, técnico e agente de suporte, com um histograma de durações
+-- usado para calcular os percentis de SLA sem varrer o histórico.
+-- As faixas do histograma precisam ser as mesmas de utils/transitions.py (HISTOGRAM_BOUNDS).
+
+-- Quem fez a última alteração; preenchido pelo app junto com o status
+alter table public.ordens_de_servico
+    add column if not exists atualizado_por uuid;
+
+create table if not exists public.os_status_transicoes (
+    id bigint generated always as identity primary key,
+    os_id uuid not null references public.ordens_de_servico (id) on delete cascade,
+    status_anterior text,
+    status_novo text not null,
+    tecnico_id uuid,
+    usuario_id uuid,
+    entrou_status_anterior_em timestamptz,
+    ocorrido_em timestamptz not null default now(),
+    duracao_segundos double precision
+);
+
+create index if not exists os_status_transicoes_os_id
+    on public.os_status_transicoes (os_id, ocorrido_em desc);
+
+-- OS que já existem: registra a entrada no status atual, para que a primeira transição não
+-- meça o tempo desde a criação. 'Aguardando Suporte' começa em data_finalizacao (envio do
+-- checklist); para os demais status a criação é a melhor estimativa disponível. Sem status
+-- anterior, essas linhas não entram no agregado diário.
+insert into public.os_status_transicoes (os_id, status_anterior, status_novo, tecnico_id, ocorrido_em)
+select o.id,
+       null,
+       o.status,
+       o.tecnico_atribuido_id,
+       case when o.status = 'Aguardando Suporte' then coalesce(o.data_finalizacao::timestamptz, o.created_at)
+            else o.created_at end
+  from public.ordens_de_servico o
+ where o.status is not null
+   and not exists (select 1 from public.os_status_transicoes t where t.os_id = o.id);
+
+create table if not exists public.os_tempo_status_diario (
+    dia date not null,
+    status text not null,
+    -- Zeros em vez de null para que a chave primária agrupe "sem técnico" / "sem agente"
+    tecnico_id uuid not null default '00000000-0000-0000-0000-000000000000',
+    suporte_id uuid not null default '00000000-0000-0000-0000-000000000000',
+    quantidade integer not null default 0,
+    total_segundos double precision not null default 0,
+    histograma integer[] not null,
+    primary key (dia, status, tecnico_id, suporte_id)
+);
+
+-- Um UPDATE que não menciona atualizado_por mantém o valor da linha, que é o autor da
+-- alteração anterior. Este trigger só dispara quando a coluna está no SET e marca a OS,
+-- apenas nesta transação, como "autor informado" para registrar_transicao_status.
+create or replace function public.marcar_autor_informado()
+returns trigger
+language plpgsql
+as $$
+begin
+    perform set_config('app.autor_informado', coalesce(current_setting('app.autor_informado', true), '') || new.id::text || ',', true);
+    return new;
+end;
+$$;
+
+drop trigger if exists ordens_de_servico_autor_informado on public.ordens_de_servico;
+create trigger ordens_de_servico_autor_informado
+    before update of atualizado_por on public.ordens_de_servico
+    for each row execute function public.marcar_autor_informado();
+
+-- Registra a transição (o histórico só recebe inserções)
+create or replace function public.registrar_transicao_status()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    entrada timestamptz;
+    autor uuid := new.atualizado_por;
+    informados text;
+begin
+    if tg_op = 'UPDATE' then
+        if new.status is not distinct from old.status then
+            return new;
+        end if;
+        select t.ocorrido_em into entrada
+          from os_status_transicoes t
+         where t.os_id = new.id
+         order by t.ocorrido_em desc, t.id desc
+         limit 1;
+        -- Sem histórico (não deveria acontecer depois da carga inicial acima): usa a criação
+        entrada := coalesce(entrada, old.created_at);
+        -- Só confia em atualizado_por se este UPDATE o informou (marcar_autor_informado)
+        informados := coalesce(current_setting('app.autor_informado', true), '');
+        if position(new.id::text || ',' in informados) = 0 then
+            autor := null;
+        else
+            perform set_config('app.autor_informado', replace(informados, new.id::text || ',', ''), true);
+        end if;
+    end if;
+
+    insert into os_status_transicoes
+        (os_id, status_anterior, status_novo, tecnico_id, usuario_id, entrou_status_anterior_em, ocorrido_em, duracao_segundos)
+    values (
+        new.id,
+        case when tg_op = 'UPDATE' then old.status end,
+        new.status,
+        new.tecnico_atribuido_id,
+        coalesce(autor, auth.uid()),
+        entrada,
+        now(),
+        extract(epoch from now() - entrada)
+    );
+    return new;
+end;
+$$;
+
+drop trigger if exists ordens_de_servico_transicao_status on public.ordens_de_servico;
+create trigger ordens_de_servico_transicao_status
+    after insert or update of status on public.ordens_de_servico
+    for each row execute function public.registrar_transicao_status();
+
+-- Mantém o agregado diário de forma incremental, uma transição por vez
+create or replace function public.acumular_tempo_status()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    limites double precision[] := array[60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400, 172800, 345600, 604800, 1209600];
+    sem_usuario constant uuid := '00000000-0000-0000-0000-000000000000';
+    faixa integer;
+begin
+    if new.status_anterior is null or new.duracao_segundos is null then
+        return new;
+    end if;
+    -- width_bucket retorna 0..13; os arrays do Postgres começam em 1
+    faixa := width_bucket(new.duracao_segundos, limites) + 1;
+
+    insert into os_tempo_status_diario as r
+        (dia, status, tecnico_id, suporte_id, quantidade, total_segundos, histograma)
+    values (
+        (new.ocorrido_em at time zone 'America/Sao_Paulo')::date,
+        new.status_anterior,
+        coalesce(new.tecnico_id, sem_usuario),
+        -- O agente de suporte é quem tirou a OS da fila de finalização
+        case when new.status_anterior = 'Aguardando Suporte' then coalesce(new.usuario_id, sem_usuario) else sem_usuario end,
+        1,
+        new.duracao_segundos,
+        array(select case when i = faixa then 1 else 0 end from generate_series(1, array_length(limites, 1) + 1) as i)
+    )
+    on conflict (dia, status, tecnico_id, suporte_id) do update
+        set quantidade = r.quantidade + 1,
+            total_segundos = r.total_segundos + excluded.total_segundos,
+            histograma[faixa] = r.histograma[faixa] + 1;
+    return new;
+end;
+$$;
+
+drop trigger if exists os_status_transicoes_acumular on public.os_status_transicoes;
+create trigger os_status_transicoes_acumular
+    after insert on public.os_status_transicoes
+    for each row execute function public.acumular_tempo_status();
+
+-- Leitura com a mesma chave das demais consultas do app (a anônima; o login é feito em um
+-- cliente à parte, veja utils/bootstrap.py); escrita apenas pelos triggers
+alter table public.os_status_transicoes enable row level security;
+alter table public.os_tempo_status_diario enable row level security;
+
+drop policy if exists "Leitura autenticada" on public.os_status_transicoes;
+drop policy if exists "Leitura do app" on public.os_status_transicoes;
+create policy "Leitura do app" on public.os_status_transicoes
+    for select to anon, authenticated using (true);
+
+drop policy if exists "Leitura autenticada" on public.os_tempo_status_diario;
+drop policy if exists "Leitura do app" on public.os_tempo_status_diario;
+create policy "Leitura do app" on public.os_tempo_status_diario
+    for select to anon, authenticated using (true);
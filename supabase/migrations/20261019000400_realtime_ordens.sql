@@ -0,0 +1,16 @@
+-- Feed de mudanças das OS (utils/live_orders.py): publica ordens_de_servico no Supabase Realtime.
+-- Os eventos só precisam do id (a chave primária já vem em DELETE); o app busca as linhas alteradas.
+do $$
+begin
+    if not exists (
+        select 1 from pg_publication_tables
+        where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = 'ordens_de_servico'
+    ) then
+        alter publication supabase_realtime add table public.ordens_de_servico;
+    end if;
+end $$;
+
+-- Recarga completa da visão: só as OS em aberto
+create index if not exists ordens_de_servico_status_abertas
+    on public.ordens_de_servico (status)
+    where status in ('Pendente', 'Em Andamento', 'Aguardando Suporte');
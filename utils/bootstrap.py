@@ -0,0 +1,314 @@
+"""
+Inicialização compartilhada pelas páginas: guarda de login, cliente Supabase,
+consultas usadas em várias páginas e importação tardia das dependências pesadas.
+"""
+import functools
+import importlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from utils.resilience import client_options, resilient_read, set_stale_handler
+from utils.shared_cache import TECNICOS, TEMPLATES_CHECKLIST, shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+# --- Importação Tardia ---
+class LazyModule:
+    """Adia a importação de um módulo até o primeiro acesso a um de seus atributos."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+# --- Verificação de Login e Permissão ---
+def require_login(allowed_levels=None, denied_message="Você não tem permissão para acessar esta página.", redirect=False):
+    """Interrompe a página se o usuário não estiver logado ou não tiver o nível de acesso exigido."""
+    if 'logged_in' not in st.session_state or not st.session_state.logged_in:
+        st.error("Você precisa estar logado para acessar esta página.")
+        if redirect:
+            st.switch_page("1_Login.py")
+        st.stop()
+
+    user_info = st.session_state.get('user_info', {})
+    if allowed_levels is not None and user_info.get('nivel_acesso') not in allowed_levels:
+        st.error(denied_message)
+        st.stop()
+    return user_info
+
+
+# --- Conexão com Supabase ---
+@st.cache_resource
+def get_supabase():
+    """Cliente Supabase único para as consultas de todas as páginas do processo (sem login; veja `get_auth_client`)."""
+    from supabase import create_client
+
+    try:
+        url = st.secrets["supabase"]["url"]
+        key = st.secrets["supabase"]["key"]
+        return create_client(url, key, options=client_options())
+    except Exception as e:
+        st.error("Erro ao conectar com o Supabase. Verifique suas credenciais em secrets.toml.")
+        st.error(e)
+        st.stop()
+
+
+def get_auth_client():
+    """
+    Cliente próprio da sessão, só para login e logout. O login troca o token do cliente em
+    que é feito (e o logout volta à chave anônima), então nunca passa pelo `get_supabase()`,
+    que é compartilhado por todas as sessões e pelas threads da visão ao vivo.
+    """
+    if "_auth_client" not in st.session_state:
+        from supabase import create_client
+
+        url = st.secrets["supabase"]["url"]
+        key = st.secrets["supabase"]["key"]
+        st.session_state["_auth_client"] = create_client(url, key, options=client_options())
+    return st.session_state["_auth_client"]
+
+
+def _warn_stale(backend, error):
+    """Avisa a sessão quando uma leitura devolve os últimos dados salvos em vez de dados novos."""
+    logger.warning("Servindo dados salvos de '%s': %s", backend, error)
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        st.toast("Serviço instável: exibindo os últimos dados carregados, que podem estar desatualizados.", icon="⚠️")
+
+
+set_stale_handler(_warn_stale)
+
+
+# --- Carregamento Concorrente ---
+@st.cache_resource
+def _get_loader_pool():
+    """Threads compartilhadas pelas sessões para disparar as consultas independentes de uma página."""
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="page-loader")
+
+
+def load_concurrently(page, **calls):
+    """
+    Dispara todas as consultas ao mesmo tempo e espera por todas juntas.
+
+    Cada argumento nomeado é uma função sem parâmetros (ex.: `lambda: get_os_details(os_id)`);
+    o retorno é um dicionário com os resultados sob os mesmos nomes. Os tempos de cada rodada
+    ficam no log e em `st.session_state['_tempos_carregamento'][page]`, comparando o tempo real
+    com a soma das consultas, que é o que a página levaria executando-as em sequência.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(fn):
+        # As funções com st.cache_data precisam do contexto da sessão que as chamou
+        add_script_run_ctx(threading.current_thread(), ctx)
+        started = time.perf_counter()
+        return fn(), time.perf_counter() - started
+
+    started = time.perf_counter()
+    pool = _get_loader_pool()
+    futures = {name: pool.submit(run, fn) for name, fn in calls.items()}
+    results, durations, error = {}, {}, None
+    for name, future in futures.items():
+        try:
+            results[name], durations[name] = future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+    elapsed = time.perf_counter() - started
+    timings = {
+        "concorrente_ms": elapsed * 1000,
+        "sequencial_ms": sum(durations.values()) * 1000,
+        "consultas_ms": {name: d * 1000 for name, d in durations.items()},
+    }
+    if ctx is not None:
+        st.session_state.setdefault('_tempos_carregamento', {})[page] = timings
+    logger.info(
+        "%s: %d consultas em %.0f ms (em sequência: %.0f ms)",
+        page, len(calls), timings["concorrente_ms"], timings["sequencial_ms"]
+    )
+    return results
+
+
+def prefetch(fn, *args):
+    """
+    Dispara `fn(*args)` nas threads de carregamento sem esperar o resultado: serve só para
+    deixar em cache o que a próxima página vai usar, sem atrasar a página atual.
+    """
+    def run():
+        try:
+            fn(*args)
+        except Exception as e:
+            # A próxima página faz a consulta de novo e mostra o erro, se persistir
+            logger.info("Pré-carregamento de %s falhou: %s", getattr(fn, "__name__", fn), e)
+
+    _get_loader_pool().submit(run)
+
+
+# --- Tempo das Seções ---
+def timed_section(name):
+    """
+    Decorador para as funções de seção das páginas (em geral fragmentos, abaixo do
+    `@st.fragment`): registra quanto durou a última execução da seção em
+    `st.session_state['_tempos_secoes'][name]` (ms), para comparar com a página completa.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                st.session_state.setdefault('_tempos_secoes', {})[name] = elapsed
+                logger.debug("Seção '%s' executada em %.1f ms", name, elapsed)
+        return wrapper
+    return decorator
+
+
+# --- Consultas Compartilhadas ---
+@resilient_read()
+@shared_cache(TECNICOS, ttl=600)
+def get_technicians():
+    """Busca todos os usuários com nível de acesso 'tecnico'."""
+    response = get_supabase().table('usuarios').select('id, nome').eq('nivel_acesso', 'tecnico').execute()
+    techs = {item['nome']: item['id'] for item in response.data}
+    return techs
+
+
+# Sem invalidação pelo app (os templates são editados direto no banco): o TTL é o atraso máximo
+@resilient_read()
+@shared_cache(TEMPLATES_CHECKLIST, ttl=600)
+def get_all_checklist_templates():
+    """Todos os templates em uma única consulta, indexados pelo tipo de veículo."""
+    response = get_supabase().table('templates_checklist').select('tipo_veiculo, itens').execute()
+    templates = {}
+    for row in response.data:
+        templates.setdefault(row['tipo_veiculo'], row.get('itens', []))
+    return templates
+
+
+def get_checklist_template(vehicle_type):
+    """Template de checklist de um tipo de veículo (lista vazia se não houver)."""
+    return get_all_checklist_templates().get(vehicle_type, [])
+
+
+# --- Visão ao Vivo das OS em Aberto ---
+LIVE_POLL_INTERVAL = 2  # segundos entre as verificações da visão (só memória, sem consultas)
+
+
+@st.cache_resource
+def get_live_orders():
+    """Visão das OS em aberto do processo, mantida pelo feed de mudanças (utils/live_orders.py)."""
+    from utils.live_orders import LiveOrders, get_feed
+
+    view = LiveOrders(get_supabase(), get_feed())
+    view.start()
+    return view
+
+
+def watch_live_orders(select):
+    """
+    Chamada depois de a página exibir `select()` (as OS da visão que ela mostra): executa a
+    página de novo só quando essas linhas mudarem, e não a cada mudança em qualquer OS.
+    """
+    from utils.live_orders import fingerprint
+
+    _watch_live_orders(select, get_live_orders().version, fingerprint(select()))
+
+
+@st.fragment(run_every=LIVE_POLL_INTERVAL)
+def _watch_live_orders(select, version, shown):
+    from utils.live_orders import fingerprint
+
+    view = get_live_orders()
+    if view.version != version and fingerprint(select()) != shown:
+        st.rerun()
+
+
+# --- Fila de Tarefas ---
+@st.cache_resource
+def get_job_queue():
+    """
+    Fila de tarefas em segundo plano do processo. Configurável em [jobs] nos segredos:
+    dir, max_workers, inline (ou JOBS_INLINE=1, que executa as tarefas na hora, para testes).
+    """
+    from utils.jobs import JobQueue
+
+    config = st.secrets.get("jobs", {})
+    queue = JobQueue(
+        config.get("dir", ".jobs"),
+        max_workers=int(config.get("max_workers", 2)),
+        limits={"upload_checklist": 2, "docx": 2, "export": 1, "evidencias": 1, "pdfs": 1},
+        inline=bool(config.get("inline", False)) or os.environ.get("JOBS_INLINE") == "1",
+    )
+    queue.purge()
+    return queue
+
+
+def render_job_status(job_id, download_label="📥 Baixar arquivo", key=None):
+    """Mostra o andamento de uma tarefa e, quando concluída, o botão para baixar o artefato."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.warning("Tarefa não encontrada.")
+    elif job["status"] in ("queued", "running"):
+        _job_progress(job_id)
+    elif job["status"] == "failed":
+        st.error(f"Falha na tarefa: {job['message']}")
+    else:
+        result = job["result"] or {}
+        if result.get("artifact_path") and os.path.exists(result["artifact_path"]):
+            with open(result["artifact_path"], "rb") as f:
+                st.download_button(download_label, data=f, file_name=result["filename"], mime=result["mime"], key=key)
+        else:
+            st.success("Tarefa concluída.")
+
+
+@st.fragment(run_every=1.5)
+def _job_progress(job_id):
+    """Atualiza só a barra de progresso; ao terminar, roda a página de novo para exibir o resultado."""
+    job = get_job_queue().get(job_id)
+    if job is None or job["status"] not in ("queued", "running"):
+        st.rerun()
+    label = "Na fila..." if job["status"] == "queued" else (job["message"] or "Processando...")
+    st.progress(job["progress"], text=label)
+
+
+# --- Aquecimento ---
+def _warm_up():
+    try:
+        get_all_checklist_templates()
+    except Exception:
+        # Sem sessão autenticada o RLS pode negar a leitura; o cache será preenchido no primeiro uso
+        pass
+
+
+@st.cache_resource
+def warm_caches():
+    """
+    Executado uma vez por processo: cria o cliente e, em uma thread em segundo plano, carrega
+    os templates, sem atrasar a primeira renderização. As dependências pesadas continuam sendo
+    importadas só pelas páginas que as usam (`lazy_import`).
+    """
+    get_supabase()
+    thread = threading.Thread(target=_warm_up, name="warm-caches", daemon=True)
+    thread.start()
+    return True
@@ -0,0 +1,87 @@
+"""
+Formato das respostas do checklist (`checklist_respostas`).
+
+Formato antigo (completo): {"Item": "Intacto" | "Defeito", ...}, um par por item do template.
+Formato esparso (atual): a lista dos itens verificados e só o que difere do padrão "Intacto",
+
+    {"formato": "esparso", "total_itens": 120, "itens": ["Item", ...],
+     "defeitos": {"Item": "observação ou ''"}, "notas": {"Item intacto": "observação"}}
+
+A lista de itens é a do template no momento do checklist: se o template ganhar itens
+depois, eles não aparecem como intactos nas OS antigas. As primeiras OS no formato
+esparso não trazem a lista e são completadas com o template atual.
+
+As funções abaixo leem os dois formatos, para que a fila do suporte e os relatórios
+funcionem com OS antigas e novas.
+"""
+import json
+
+INTACTO = "Intacto"
+DEFEITO = "Defeito"
+FORMATO_ESPARSO = "esparso"
+
+
+def encode_sparse(items, defects, notes=None):
+    """Serializa as respostas guardando os itens verificados e apenas defeitos e observações."""
+    return json.dumps({
+        "formato": FORMATO_ESPARSO,
+        "total_itens": len(items),
+        "itens": list(items),
+        "defeitos": defects,
+        "notas": {item: note for item, note in (notes or {}).items() if note and item not in defects},
+    })
+
+
+def _load(raw):
+    if isinstance(raw, dict):
+        return raw
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+def parse_checklist(raw):
+    """
+    Lê os dois formatos e retorna um dicionário com:
+    `defeitos` ({item: observação}), `notas` ({item: observação} dos itens intactos),
+    `total_itens`, `intactos` (quantidade), `respostas` (os itens conhecidos, com status) e
+    `itens` (os itens verificados, ou None quando a OS não os registrou).
+    No formato esparso, `respostas` traz só os itens com defeito ou observação.
+    """
+    data = _load(raw)
+    if data.get("formato") == FORMATO_ESPARSO:
+        defects = data.get("defeitos", {})
+        notes = data.get("notas", {})
+        items = data.get("itens")
+        total = data.get("total_itens", len(defects))
+        answers = {item: DEFEITO for item in defects}
+        answers.update({item: INTACTO for item in notes})
+    else:
+        defects = {item: "" for item, status in data.items() if status == DEFEITO}
+        notes = {}
+        items = list(data)
+        total = len(data)
+        answers = dict(data)
+    return {
+        "defeitos": defects,
+        "notas": notes,
+        "total_itens": total,
+        "intactos": total - len(defects),
+        "respostas": answers,
+        "itens": items,
+    }
+
+
+def expand_checklist(raw, template_items):
+    """
+    Respostas completas {item: status}, preenchendo com 'Intacto' os itens verificados sem
+    registro. `template_items` só é usado nas OS que não guardaram a lista de itens.
+    """
+    parsed = parse_checklist(raw)
+    items = parsed["itens"] if parsed["itens"] is not None else template_items
+    answers = {item: INTACTO for item in items or []}
+    answers.update(parsed["respostas"])
+    return answers
@@ -0,0 +1,184 @@
+"""
+Exportação em lote das fotos e assinaturas das OS (evidências) em um arquivo ZIP.
+
+Os arquivos ficam organizados por placa e OS (`PLACA/OSID/foto_placa.png`) e o ZIP traz
+um `manifesto.csv` com a origem, o tamanho e o SHA-256 de cada arquivo, além das falhas.
+Os downloads rodam em paralelo sobre uma única sessão HTTP com pool de conexões; cada
+download em andamento ocupa no máximo SPOOL_MAX_MEMORY na memória (o excedente vai para
+um arquivo temporário), e o número de downloads em andamento é limitado, de forma que a
+memória usada não depende da quantidade de OS.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.resilience import get_executor
+
+GRUPOS = [("fotos_urls", "foto"), ("assinaturas_urls", "assinatura")]
+DOWNLOAD_TIMEOUT = 30  # segundos por arquivo
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024
+CONTENT_TYPES = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}
+MANIFEST_COLUMNS = ["os_id", "placa", "cliente", "tipo", "chave", "arquivo", "url", "bytes", "sha256", "erro"]
+
+
+def _load_json(value):
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value or "{}")
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+def _safe(name):
+    """Nome seguro para pasta/arquivo dentro do ZIP."""
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(name or "")).strip("_") or "SEM_PLACA"
+
+
+def list_evidence(os_list):
+    """Um item por foto/assinatura das OS, com o caminho (sem extensão) que terá no ZIP."""
+    items = []
+    for os_data in os_list:
+        folder = f"{_safe(os_data.get('veiculo_placa'))}/{os_data['id'][:8]}"
+        for column, tipo in GRUPOS:
+            for key, url in _load_json(os_data.get(column)).items():
+                if url:
+                    items.append({
+                        "os_id": os_data["id"],
+                        "placa": os_data.get("veiculo_placa"),
+                        "cliente": os_data.get("cliente_nome"),
+                        "tipo": tipo,
+                        "chave": key,
+                        "url": url,
+                        "arquivo": f"{folder}/{tipo}_{_safe(key)}",
+                    })
+    return items
+
+
+def _new_session(max_workers):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _download(session, url):
+    """Baixa em partes para um arquivo temporário (na memória até SPOOL_MAX_MEMORY)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    digest = hashlib.sha256()
+    try:
+        with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "").split(";")[0].strip()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                spool.write(chunk)
+                digest.update(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    size = spool.tell()
+    spool.seek(0)
+    return spool, size, digest.hexdigest(), content_type
+
+
+def _extension(url, content_type):
+    ext = os.path.splitext(url.split("?")[0])[1].lower()
+    return ext if ext in (".png", ".jpg", ".jpeg", ".webp") else CONTENT_TYPES.get(content_type, ".bin")
+
+
+def export_evidence_zip(os_list, zip_file, max_workers=8, progress_callback=None):
+    """
+    Baixa as evidências das OS e grava no ZIP (arquivo aberto em modo binário) assim que
+    cada download termina. Retorna um dicionário com as métricas da exportação.
+    """
+    items = list_evidence(os_list)
+    executor = get_executor()
+    session = _new_session(max_workers)
+    manifest = []
+    total_bytes = 0
+    done = 0
+    start = time.perf_counter()
+
+    # As imagens já são comprimidas: ZIP_STORED evita gastar CPU sem reduzir o tamanho
+    with zipfile.ZipFile(zip_file, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive, \
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="evidencias") as pool:
+        pending = {}
+        queue = iter(items)
+
+        def submit_next():
+            item = next(queue, None)
+            if item is not None:
+                future = pool.submit(executor.call, "imagens", _download, session, item["url"],
+                                     timeout=DOWNLOAD_TIMEOUT, idempotent=True)
+                pending[future] = item
+
+        for _ in range(max_workers * 2):
+            submit_next()
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                item = pending.pop(future)
+                row = {**item, "bytes": 0, "sha256": "", "erro": ""}
+                try:
+                    spool, size, sha256, content_type = future.result()
+                except Exception as e:
+                    row["arquivo"] = ""
+                    row["erro"] = str(e)
+                else:
+                    row["arquivo"] = item["arquivo"] + _extension(item["url"], content_type)
+                    with spool, archive.open(row["arquivo"], "w") as dest:
+                        shutil.copyfileobj(spool, dest, CHUNK_SIZE)
+                    row.update({"bytes": size, "sha256": sha256})
+                    total_bytes += size
+                manifest.append(row)
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(items))
+                submit_next()
+
+        manifest.sort(key=lambda row: (row["placa"] or "", row["os_id"], row["tipo"], row["chave"]))
+        with archive.open("manifesto.csv", "w") as raw, \
+                io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=MANIFEST_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(manifest)
+
+    session.close()
+    elapsed = time.perf_counter() - start
+    falhas = [row for row in manifest if row["erro"]]
+    return {
+        "ordens": len(os_list),
+        "arquivos": len(items),
+        "baixados": len(items) - len(falhas),
+        "falhas": len(falhas),
+        "bytes": total_bytes,
+        "segundos": elapsed,
+        "mb_por_segundo": (total_bytes / 1024 / 1024 / elapsed) if elapsed else 0.0,
+    }
+
+
+# --- Handler da Fila ---
+def evidence_job(params, ctx):
+    filename = params["filename"]
+    path = ctx.artifact_path(filename)
+    with open(path, "wb") as zip_file:
+        stats = export_evidence_zip(
+            params["os_list"],
+            zip_file,
+            progress_callback=lambda done, total: ctx.progress(done / total, f"Baixando evidências... {done}/{total}")
+        )
+    return {"artifact_path": path, "filename": filename, "mime": "application/zip", "estatisticas": stats}
@@ -0,0 +1,192 @@
+"""
+Exportação das OS finalizadas em Excel, CSV e Parquet.
+
+Os escritores recebem um iterável de linhas e gravam direto no arquivo (Excel no modo
+write-only do openpyxl, Parquet em lotes), de forma que a memória usada não cresce com
+o tamanho do período exportado.
+"""
+import csv
+from datetime import datetime
+
+from utils.checklist import parse_checklist
+from utils.resilience import get_executor
+
+EXPORT_FORMATS = {
+    "xlsx": {"label": "Excel (.xlsx)", "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    "csv": {"label": "CSV (.csv)", "mime": "text/csv"},
+    "parquet": {"label": "Parquet (.parquet)", "mime": "application/vnd.apache.parquet"},
+}
+
+# Colunas que não entram no relatório (JSON de respostas, URLs e índice de busca)
+DROP_COLUMNS = {
+    "checklist_respostas", "fotos_urls", "assinaturas_urls",
+    "fotos_miniaturas_urls", "assinaturas_miniaturas_urls", "busca_texto",
+}
+DATE_COLUMNS = ("created_at", "data_finalizacao")
+# Tipos das colunas no Parquet que não são texto; as demais (texto, uuid, JSON) são string.
+# O esquema é fixado antes da primeira gravação: inferir do primeiro lote quebraria quando
+# uma coluna vem toda nula nele (ex.: atualizado_por nas OS antigas) e preenchida depois.
+PARQUET_TYPES = {
+    "bloqueio_instalado": "bool",
+    "itens_com_defeito": "int64",
+    "created_at": "timestamp",
+    "data_finalizacao": "timestamp",
+}
+PAGE_SIZE = 1000  # limite padrão de linhas por resposta do PostgREST
+PARQUET_BATCH = 10_000
+
+
+def format_timestamp(value):
+    if not value:
+        return value
+    try:
+        return datetime.fromisoformat(value).strftime('%d/%m/%Y %H:%M')
+    except ValueError:
+        return value
+
+
+def report_row(row, format_dates=True):
+    """
+    Linha do relatório: datas formatadas, contagem de defeitos e sem as colunas internas.
+    Com `format_dates=False` as datas ficam em ISO 8601 (Parquet, que as grava como timestamp).
+    """
+    out = {key: value for key, value in row.items() if key not in DROP_COLUMNS}
+    if format_dates:
+        for column in DATE_COLUMNS:
+            if column in out:
+                out[column] = format_timestamp(out[column])
+    if "checklist_respostas" in row:
+        out["itens_com_defeito"] = len(parse_checklist(row["checklist_respostas"])["defeitos"])
+    return out
+
+
+def iter_finalized_rows(client, start_date, end_date, page_size=PAGE_SIZE):
+    """Percorre as OS finalizadas do período em páginas, sem carregar todas de uma vez."""
+    offset = 0
+    while True:
+        query = client.table('ordens_de_servico').select("*") \
+            .eq('status', 'Finalizada') \
+            .gte('data_finalizacao', start_date) \
+            .lte('data_finalizacao', end_date) \
+            .order('data_finalizacao').order('id') \
+            .range(offset, offset + page_size - 1)
+        response = get_executor().call("supabase", query.execute, idempotent=True)
+        rows = response.data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def _with_columns(rows):
+    """Usa as chaves da primeira linha como colunas; retorna (colunas, iterador completo)."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return [], iter(())
+    columns = list(first.keys())
+
+    def chain():
+        yield first
+        yield from rows
+    return columns, chain()
+
+
+def write_xlsx(rows, path):
+    from openpyxl import Workbook
+
+    columns, rows = _with_columns(rows)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Relatorio_OS")
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([row.get(column) for column in columns])
+    workbook.save(path)
+
+
+def write_csv(rows, path):
+    columns, rows = _with_columns(rows)
+    # utf-8-sig para o Excel reconhecer a acentuação ao abrir o CSV
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _parquet_value(kind, value):
+    if value is None or value == "":
+        return None if kind != "string" else value
+    if kind == "timestamp":
+        return datetime.fromisoformat(value) if isinstance(value, str) else value
+    if kind == "bool":
+        return bool(value)
+    if kind == "int64":
+        return int(value)
+    return value if isinstance(value, str) else str(value)
+
+
+def parquet_schema(columns):
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(),
+        "bool": pa.bool_(),
+        "int64": pa.int64(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(column, types[PARQUET_TYPES.get(column, "string")]) for column in columns])
+
+
+def write_parquet(rows, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns, rows = _with_columns(rows)
+    schema = parquet_schema(columns)
+    kinds = {column: PARQUET_TYPES.get(column, "string") for column in columns}
+    batch = []
+
+    with pq.ParquetWriter(path, schema) as writer:
+        def flush():
+            values = [{c: _parquet_value(kinds[c], row.get(c)) for c in columns} for row in batch]
+            writer.write_table(pa.Table.from_pylist(values, schema=schema))
+            batch.clear()
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH:
+                flush()
+        if batch:
+            flush()
+
+
+WRITERS = {"xlsx": write_xlsx, "csv": write_csv, "parquet": write_parquet}
+
+
+def write_export(fmt, rows, path):
+    WRITERS[fmt](rows, path)
+
+
+def export_filename(start_date, end_date, fmt):
+    return f"relatorio_os_{start_date.replace('-', '')}_{end_date.replace('-', '')}.{fmt}"
+
+
+# --- Handler da Fila ---
+def export_job(params, ctx):
+    """Busca as OS finalizadas do período em páginas e grava o arquivo no formato pedido."""
+    from utils.reports import get_worker_client
+
+    client = get_worker_client()
+    fmt, total = params["fmt"], params.get("total") or 0
+    filename = export_filename(params["start_date"], params["end_date"], fmt)
+
+    def rows():
+        for index, row in enumerate(iter_finalized_rows(client, params["start_date"], params["end_date"])):
+            if total and index % PAGE_SIZE == 0:
+                ctx.progress(index / total, f"Exportando {index}/{total} OS...")
+            yield report_row(row, format_dates=fmt != "parquet")
+
+    ctx.progress(0.0, "Buscando as OS...")
+    path = ctx.artifact_path(filename)
+    write_export(fmt, rows(), path)
+    return {"artifact_path": path, "filename": filename, "mime": EXPORT_FORMATS[fmt]["mime"]}
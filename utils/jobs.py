@@ -0,0 +1,364 @@
+"""
+Fila local de tarefas em segundo plano (relatórios, exportações e uploads).
+
+As tarefas ficam em um banco SQLite, o que permite retomá-las após um reinício do
+servidor, e são executadas em um pool de processos com limite global e por tipo.
+Com `inline=True` (modo de teste) a tarefa roda na própria chamada de `enqueue`.
+
+Vários processos podem usar a mesma pasta (ex.: duas réplicas no mesmo servidor): cada
+tarefa é reservada com um UPDATE condicional ao status 'queued', então só um processo a
+executa, e quem a reservou renova um heartbeat enquanto ela roda. Só voltam para a fila
+as tarefas cujo heartbeat parou, isto é, de um processo que morreu.
+
+Os handlers são referenciados por caminho ("modulo:funcao") e recebem
+`(params, ctx)`; `ctx.progress()` informa o andamento e `ctx.artifact_path()`
+indica onde gravar o arquivo gerado. O retorno deve ser None ou um dicionário
+com `artifact_path`, `filename` e `mime`.
+"""
+import importlib
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Tipos de tarefa conhecidos
+HANDLERS = {
+    "docx": "utils.reports:docx_job",
+    "evidencias": "utils.evidence_export:evidence_job",
+    "export": "utils.export:export_job",
+    "pdfs": "utils.pdf_export:pdf_job",
+    "upload_checklist": "utils.reports:upload_checklist_job",
+}
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 0.5  # segundos
+HEARTBEAT_INTERVAL = 5.0  # segundos entre as renovações do heartbeat das tarefas em execução
+STALE_AFTER = 30.0  # segundos sem heartbeat para considerar morto o processo que reservou a tarefa
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _resolve(kind):
+    module_name, func_name = HANDLERS[kind].split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+class JobContext:
+    """Passado ao handler para reportar progresso e localizar a pasta de artefatos."""
+
+    def __init__(self, db_path, job_id, artifacts_dir):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.artifacts_dir = artifacts_dir
+        self._conn = None
+
+    def progress(self, fraction, message=None):
+        if self._conn is None:
+            self._conn = _connect(self.db_path)
+        self._conn.execute(
+            "UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ?",
+            (max(0.0, min(1.0, fraction)), message, self.job_id)
+        )
+
+    def artifact_path(self, filename):
+        folder = os.path.join(self.artifacts_dir, self.job_id)
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, filename)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def run_job(db_path, artifacts_dir, job_id):
+    """Executa uma tarefa e grava o resultado no banco. Roda no processo do pool (ou inline)."""
+    conn = _connect(db_path)
+    row = conn.execute("SELECT kind, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    ctx = JobContext(db_path, job_id, artifacts_dir)
+    try:
+        result = _resolve(row["kind"])(json.loads(row["params"]), ctx)
+        conn.execute(
+            "UPDATE jobs SET status = ?, progress = 1, result = ?, finished_at = ? WHERE id = ?",
+            (DONE, json.dumps(result), time.time(), job_id)
+        )
+    except Exception as e:
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, message = ?, finished_at = ? WHERE id = ?",
+            (FAILED, traceback.format_exc(), str(e), time.time(), job_id)
+        )
+    finally:
+        ctx.close()
+        conn.close()
+
+
+class JobQueue:
+    def __init__(self, base_dir, max_workers=2, limits=None, inline=False):
+        """
+        `base_dir` guarda o banco (jobs.sqlite3), os artefatos gerados (artifacts/) e os
+        arquivos de entrada que as páginas deixam para as tarefas (spool/).
+        """
+        self.db_path = os.path.join(base_dir, "jobs.sqlite3")
+        self.artifacts_dir = os.path.join(base_dir, "artifacts")
+        self.spool_dir = os.path.join(base_dir, "spool")
+        self.max_workers = max_workers
+        self.limits = limits or {}
+        self.inline = inline
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        # Identifica este processo nas tarefas que ele reservar
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        conn = _connect(self.db_path)
+        conn.executescript(SCHEMA)
+        # Bancos criados antes das colunas de reserva
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+        for name, decl in (("worker", "TEXT"), ("heartbeat", "REAL")):
+            if name not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+                except sqlite3.OperationalError:
+                    pass  # outro processo acabou de criar a coluna
+        conn.close()
+        self._recover_stale()
+
+        self._running = {}  # future -> (job_id, kind)
+        self._lock = threading.RLock()  # o callback pode rodar na própria thread do despacho
+        self._wakeup = threading.Event()
+        self._executor = None
+        if not inline:
+            self._executor = self._new_executor()
+            threading.Thread(target=self._dispatch_loop, name="job-dispatcher", daemon=True).start()
+
+    # --- API usada pelas páginas ---
+    def enqueue(self, kind, params, owner=None):
+        """Registra a tarefa e retorna o seu id."""
+        if kind not in HANDLERS:
+            raise ValueError(f"Tipo de tarefa desconhecido: {kind}")
+        job_id = str(uuid.uuid4())
+        conn = _connect(self.db_path)
+        conn.execute(
+            "INSERT INTO jobs (id, kind, owner, params, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, owner, json.dumps(params, default=str), QUEUED, time.time())
+        )
+        conn.close()
+        if self.inline:
+            if self._claim(job_id):
+                run_job(self.db_path, self.artifacts_dir, job_id)
+        else:
+            self._wakeup.set()
+        return job_id
+
+    def retry(self, job_id):
+        """
+        Devolve à fila uma tarefa que falhou, com os mesmos parâmetros (e os mesmos arquivos
+        de entrada, que continuam no spool). Retorna False se a tarefa não estiver com falha.
+        """
+        conn = _connect(self.db_path)
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, progress = 0, message = 'Reenviada', error = NULL, attempts = 0, "
+            "started_at = NULL, finished_at = NULL, worker = NULL, heartbeat = NULL WHERE id = ? AND status = ?",
+            (QUEUED, job_id, FAILED)
+        )
+        requeued = cursor.rowcount > 0
+        conn.close()
+        if not requeued:
+            return False
+        if self.inline:
+            if self._claim(job_id):
+                run_job(self.db_path, self.artifacts_dir, job_id)
+        else:
+            self._wakeup.set()
+        return True
+
+    def spool_path(self, *parts):
+        """Caminho em disco para um arquivo de entrada de uma tarefa (a pasta é criada)."""
+        path = os.path.join(self.spool_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def get(self, job_id):
+        conn = _connect(self.db_path)
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = None  # parâmetros podem ser grandes e não interessam à interface
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def list(self, owner=None, limit=20):
+        conn = _connect(self.db_path)
+        query = "SELECT id FROM jobs" + (" WHERE owner = ?" if owner else "") + " ORDER BY created_at DESC LIMIT ?"
+        ids = [r["id"] for r in conn.execute(query, ((owner, limit) if owner else (limit,))).fetchall()]
+        conn.close()
+        return [self.get(job_id) for job_id in ids]
+
+    def purge(self, older_than_seconds=24 * 3600):
+        """Remove tarefas concluídas antigas e seus artefatos, e arquivos de entrada antigos."""
+        cutoff = time.time() - older_than_seconds
+        conn = _connect(self.db_path)
+        ids = [r["id"] for r in conn.execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff)
+        ).fetchall()]
+        for job_id in ids:
+            shutil.rmtree(os.path.join(self.artifacts_dir, job_id), ignore_errors=True)
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        conn.close()
+        # Arquivos deixados por checklists abandonados antes do envio
+        for name in os.listdir(self.spool_dir):
+            path = os.path.join(self.spool_dir, name)
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        return len(ids)
+
+    # --- Despacho ---
+    def _new_executor(self):
+        # 'spawn' evita fazer fork do servidor do Streamlit, que tem várias threads ativas
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _claim(self, job_id):
+        """
+        Reserva a tarefa para este processo. O filtro de status faz parte do próprio UPDATE
+        (compare-and-set): se outro processo a reservou antes, nenhuma linha muda e retorna False.
+        """
+        now = time.time()
+        conn = _connect(self.db_path)
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, worker = ?, heartbeat = ? "
+            "WHERE id = ? AND status = ?",
+            (RUNNING, now, self.worker_id, now, job_id, QUEUED)
+        )
+        claimed = cursor.rowcount > 0
+        conn.close()
+        return claimed
+
+    def _requeue(self, job_id):
+        conn = _connect(self.db_path)
+        conn.execute(
+            "UPDATE jobs SET status = ?, attempts = attempts - 1, started_at = NULL, worker = NULL, heartbeat = NULL "
+            "WHERE id = ? AND worker = ?",
+            (QUEUED, job_id, self.worker_id)
+        )
+        conn.close()
+
+    def _heartbeat(self):
+        """Renova o heartbeat das tarefas que este processo está executando."""
+        conn = _connect(self.db_path)
+        conn.execute("UPDATE jobs SET heartbeat = ? WHERE worker = ? AND status = ?", (time.time(), self.worker_id, RUNNING))
+        conn.close()
+
+    def _recover_stale(self):
+        """
+        Devolve à fila as tarefas em execução cujo processo parou de renovar o heartbeat
+        (servidor reiniciado ou réplica morta); as de outros processos vivos não são tocadas.
+        """
+        stale = time.time() - STALE_AFTER
+        conn = _connect(self.db_path)
+        conn.execute(
+            "UPDATE jobs SET status = ?, message = 'Retomada após reinício', worker = NULL, heartbeat = NULL "
+            "WHERE status = ? AND (heartbeat IS NULL OR heartbeat < ?) AND attempts < ?",
+            (QUEUED, RUNNING, stale, MAX_ATTEMPTS)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, message = 'Interrompida repetidas vezes', finished_at = ? "
+            "WHERE status = ? AND (heartbeat IS NULL OR heartbeat < ?)",
+            (FAILED, time.time(), RUNNING, stale)
+        )
+        conn.close()
+
+    def _has_capacity(self, kind):
+        running = [k for _, k in self._running.values()]
+        if len(running) >= self.max_workers:
+            return False
+        return running.count(kind) < self.limits.get(kind, self.max_workers)
+
+    def _dispatch_loop(self):
+        last_heartbeat = 0.0
+        while True:
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+            try:
+                if time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    self._heartbeat()
+                    self._recover_stale()
+                    last_heartbeat = time.monotonic()
+                self._dispatch_once()
+            except Exception:
+                traceback.print_exc()
+
+    def _dispatch_once(self):
+        with self._lock:
+            if len(self._running) >= self.max_workers:
+                return
+            conn = _connect(self.db_path)
+            queued = conn.execute(
+                "SELECT id, kind FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+            conn.close()
+            for row in queued:
+                if not self._has_capacity(row["kind"]):
+                    continue
+                if not self._claim(row["id"]):
+                    continue  # reservada por outro processo entre a consulta e o UPDATE
+                try:
+                    future = self._executor.submit(run_job, self.db_path, self.artifacts_dir, row["id"])
+                except BrokenProcessPool:
+                    # Um processo do pool morreu (ex.: falta de memória); recria o pool e tenta depois
+                    self._requeue(row["id"])
+                    self._executor = self._new_executor()
+                    self._wakeup.set()
+                    return
+                self._running[future] = (row["id"], row["kind"])
+                future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        with self._lock:
+            job_id, _ = self._running.pop(future)
+        error = future.exception()
+        if error is not None:
+            # O processo do pool morreu antes de gravar o resultado
+            conn = _connect(self.db_path)
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, message = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (FAILED, repr(error), str(error), time.time(), job_id, RUNNING)
+            )
+            conn.close()
+        self._wakeup.set()
@@ -0,0 +1,310 @@
+"""
+Visão ao vivo das OS em aberto (Pendente, Em Andamento e Aguardando Suporte).
+
+Cada processo do app mantém na memória uma única cópia das OS em aberto, atualizada por
+um feed de mudanças em vez de consultas com TTL por sessão. As páginas leem dessa visão
+e só são executadas de novo quando as OS que exibem mudam (`watch_live_orders` em
+utils/bootstrap.py). O feed é configurado em [realtime] nos segredos:
+
+    [realtime]
+    feed = "supabase"               # Supabase Realtime (padrão)
+    # feed = "local"                # substituto local: eventos publicados pelo próprio app
+    # path = ".cache/eventos.sqlite3"
+
+- "supabase": assina as mudanças de `ordens_de_servico` pelo Realtime (a tabela precisa
+  estar na publicação `supabase_realtime`, ver supabase/migrations);
+- "local": as escritas feitas pelo app (`publish_change`, chamado por `transition_orders`
+  e pela criação de OS) gravam os ids alterados em uma tabela SQLite compartilhada pelos
+  processos da máquina, inclusive os da fila de tarefas, que cada visão lê a cada segundo.
+
+Os eventos trazem só os ids: a visão busca as linhas alteradas em uma única consulta por
+lote. A cada (re)conexão do feed e a cada RESYNC_INTERVAL a visão é recarregada inteira,
+cobrindo eventos perdidos; com o feed fora do ar, a recarga passa a ser a cada
+DEGRADED_RESYNC_INTERVAL.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+
+from utils.resilience import BackendUnavailable, get_executor
+from utils.transitions import AGUARDANDO_SUPORTE, EM_ANDAMENTO, PENDENTE
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = (PENDENTE, EM_ANDAMENTO, AGUARDANDO_SUPORTE)
+RESYNC_INTERVAL = 300  # segundos entre recargas completas com o feed conectado
+DEGRADED_RESYNC_INTERVAL = 30  # com o feed fora do ar
+BATCH_WINDOW = 0.2  # segundos para juntar eventos próximos em uma única consulta
+READY_TIMEOUT = 10
+LOCAL_POLL_INTERVAL = 1.0
+LOCAL_RETENTION = 3600  # segundos que um evento fica na tabela do feed local
+DISCONNECTED_GRACE = 60  # segundos sem conexão até o feed do Realtime ser dado como fora do ar
+
+LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS eventos (id INTEGER PRIMARY KEY AUTOINCREMENT, os_id TEXT NOT NULL, criado_em REAL NOT NULL);
+"""
+
+
+# --- Feeds de Mudanças ---
+class LocalFeed:
+    """Substituto local do Realtime: eventos em uma tabela SQLite compartilhada pelos processos."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.executescript(LOCAL_SCHEMA)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def publish(self, os_ids):
+        conn = self._connect()
+        now = time.time()
+        conn.executemany("INSERT INTO eventos (os_id, criado_em) VALUES (?, ?)", [(i, now) for i in os_ids])
+        conn.execute("DELETE FROM eventos WHERE criado_em < ?", (now - LOCAL_RETENTION,))
+        conn.close()
+
+    def listen(self, notify, stop):
+        """Bloqueia lendo os eventos novos até `stop`; `notify(None)` pede uma recarga completa."""
+        conn = self._connect()
+        try:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM eventos").fetchone()[0]
+            notify(None)
+            while not stop.wait(LOCAL_POLL_INTERVAL):
+                rows = conn.execute("SELECT id, os_id FROM eventos WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+                if rows:
+                    last_id = rows[-1][0]
+                    notify({os_id for _, os_id in rows})
+        finally:
+            conn.close()
+
+
+class SupabaseRealtimeFeed:
+    """Mudanças de `ordens_de_servico` pelo Supabase Realtime (postgres_changes)."""
+
+    def __init__(self, url, key):
+        self.url = url
+        self.key = key
+
+    def publish(self, os_ids):
+        pass  # o próprio banco emite os eventos
+
+    def listen(self, notify, stop):
+        asyncio.run(self._listen(notify, stop))
+
+    async def _listen(self, notify, stop):
+        from realtime import AsyncRealtimeClient, RealtimeSubscribeStates
+
+        client = AsyncRealtimeClient(f"{self.url}/realtime/v1", self.key)
+        await client.connect()
+
+        def on_change(payload):
+            data = payload.get("data", {})
+            record = data.get("record") or data.get("old_record") or {}
+            if record.get("id"):
+                notify({record["id"]})
+
+        def on_subscribe(state, error):
+            if state == RealtimeSubscribeStates.SUBSCRIBED:
+                notify(None)  # eventos anteriores à assinatura podem ter sido perdidos
+            elif error is not None:
+                logger.warning("Realtime: assinatura em estado %s: %s", state, error)
+
+        channel = client.channel("ordens_de_servico")
+        channel.on_postgres_changes("*", schema="public", table="ordens_de_servico", callback=on_change)
+        await channel.subscribe(on_subscribe)
+
+        disconnected_since = None
+        try:
+            while not stop.is_set():
+                await asyncio.sleep(1)
+                if client.is_connected:
+                    if disconnected_since is not None:
+                        notify(None)  # reconectou: recarrega o que mudou nesse meio-tempo
+                    disconnected_since = None
+                elif disconnected_since is None:
+                    disconnected_since = time.monotonic()
+                elif time.monotonic() - disconnected_since > DISCONNECTED_GRACE:
+                    raise ConnectionError("Realtime desconectado")
+        finally:
+            await client.close()
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_feed():
+    """Feed do processo, criado na primeira chamada a partir de [realtime] nos segredos."""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            import streamlit as st
+
+            config = st.secrets.get("realtime", {})
+            if config.get("feed", "supabase") == "local":
+                _feed = LocalFeed(config.get("path", os.path.join(".cache", "eventos.sqlite3")))
+            else:
+                _feed = SupabaseRealtimeFeed(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"])
+        return _feed
+
+
+# --- Visão das OS em Aberto ---
+_views = weakref.WeakSet()
+
+
+def publish_change(os_ids):
+    """
+    Avisa que as OS mudaram: publica no feed (no local; no Realtime o banco já avisa) e
+    atualiza na hora as visões deste processo, para quem fez a mudança já vê-la no próximo rerun.
+    """
+    os_ids = list(os_ids)
+    if not os_ids:
+        return
+    try:
+        get_feed().publish(os_ids)
+    except Exception:
+        logger.exception("Falha ao publicar mudança de %d OS no feed", len(os_ids))
+    for view in list(_views):
+        try:
+            view.refresh(os_ids)
+        except Exception:
+            logger.exception("Falha ao atualizar a visão das OS em aberto")
+
+
+def fingerprint(rows):
+    """Impressão digital das linhas exibidas por uma página, para saber se mudaram."""
+    return hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class LiveOrders:
+    def __init__(self, client, feed):
+        self.client = client
+        self.feed = feed
+        self.version = 0
+        self.connected = False
+        self.stats = {"recargas": 0, "atualizacoes": 0, "eventos": 0}
+        self._rows = {}
+        self._lock = threading.Lock()
+        self._resync_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._changes = queue.Queue()
+        self._stop = threading.Event()
+        _views.add(self)
+
+    def start(self):
+        threading.Thread(target=self._listen_loop, name="live-orders-feed", daemon=True).start()
+        threading.Thread(target=self._apply_loop, name="live-orders-apply", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._changes.put(None)
+
+    # --- Leitura ---
+    def select(self, order_by=None, **filters):
+        """OS em aberto com os campos iguais a `filters`, ordenadas por `order_by`."""
+        self.wait_ready()
+        with self._lock:
+            rows = [row for row in self._rows.values() if all(row.get(k) == v for k, v in filters.items())]
+        if order_by:
+            rows.sort(key=lambda row: (row.get(order_by) is None, row.get(order_by) or ""))
+        return rows
+
+    def count(self, **filters):
+        return len(self.select(**filters))
+
+    def wait_ready(self):
+        """Na primeira leitura, espera a carga inicial (ou a faz na hora, se o feed ainda não a pediu)."""
+        if self._ready.is_set():
+            return
+        if not self._ready.wait(READY_TIMEOUT):
+            self.resync()
+
+    # --- Atualização ---
+    def resync(self):
+        """Recarrega todas as OS em aberto em uma única consulta."""
+        with self._resync_lock:
+            query = self.client.table('ordens_de_servico').select("*").in_('status', list(OPEN_STATUSES))
+            try:
+                rows = get_executor().call("supabase", query.execute, idempotent=True).data
+            except BackendUnavailable:
+                if not self._ready.is_set():
+                    raise
+                logger.warning("Visão das OS em aberto: recarga falhou; mantendo os dados atuais")
+                return
+            with self._lock:
+                fresh = {row['id']: row for row in rows}
+                if fresh != self._rows:
+                    self._rows = fresh
+                    self.version += 1
+            self.stats["recargas"] += 1
+            self._ready.set()
+
+    def refresh(self, os_ids):
+        """Busca só as OS alteradas; as que saíram dos status em aberto deixam a visão."""
+        os_ids = list(os_ids)
+        query = self.client.table('ordens_de_servico').select("*").in_('id', os_ids)
+        rows = {row['id']: row for row in get_executor().call("supabase", query.execute, idempotent=True).data}
+        with self._lock:
+            changed = False
+            for os_id in os_ids:
+                row = rows.get(os_id)
+                if row is not None and row.get('status') in OPEN_STATUSES:
+                    changed |= self._rows.get(os_id) != row
+                    self._rows[os_id] = row
+                elif os_id in self._rows:
+                    del self._rows[os_id]
+                    changed = True
+            if changed:
+                self.version += 1
+        self.stats["atualizacoes"] += 1
+
+    def _notify(self, os_ids):
+        self.stats["eventos"] += 1
+        self._changes.put(os_ids if os_ids is not None else "recarga")
+
+    def _listen_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.connected = True
+                self.feed.listen(self._notify, self._stop)
+            except Exception:
+                logger.exception("Feed de mudanças das OS caiu; recarregando a cada %d s", DEGRADED_RESYNC_INTERVAL)
+            self.connected = False
+            self._notify(None)
+            self._stop.wait(DEGRADED_RESYNC_INTERVAL)
+
+    def _apply_loop(self):
+        while not self._stop.is_set():
+            try:
+                first = self._changes.get(timeout=RESYNC_INTERVAL if self.connected else DEGRADED_RESYNC_INTERVAL)
+            except queue.Empty:
+                first = "recarga"
+            if first is None:
+                return
+            # Junta os eventos que chegarem logo em seguida em uma única consulta
+            batch = [first]
+            deadline = time.monotonic() + BATCH_WINDOW
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self._changes.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                if "recarga" in batch:
+                    self.resync()
+                else:
+                    self.refresh(set().union(*(ids for ids in batch if ids)))
+            except Exception:
+                logger.exception("Falha ao aplicar mudanças na visão das OS em aberto")
@@ -0,0 +1,268 @@
+import io
+import json
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import requests
+from fpdf import FPDF
+
+from utils.checklist import parse_checklist
+from utils.resilience import BackendUnavailable, get_executor
+
+try:
+    import resource
+except ImportError:  # Windows não possui o módulo resource
+    resource = None
+
+# --- Layout do Relatório ---
+FOTOS = [
+    ("placa", "Placa"),
+    ("local", "Local de Instalação"),
+    ("rastreador", "Rastreador"),
+    ("extra", "Extra"),
+]
+ASSINATURAS = [
+    ("tecnico", "Assinatura do Técnico"),
+    ("cliente", "Assinatura do Cliente"),
+]
+IMAGE_TIMEOUT = 15  # segundos por imagem
+
+
+def _load_json(value):
+    """Aceita tanto o JSON salvo como texto quanto um dicionário já decodificado."""
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+def _text(value):
+    """As fontes padrão do PDF só aceitam latin-1; caracteres fora dele viram '?'."""
+    if value is None or value == "":
+        return "N/A"
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+def _download(session, url):
+    response = session.get(url, timeout=IMAGE_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def _fetch_image(session, url):
+    try:
+        return io.BytesIO(get_executor().call("imagens", _download, session, url, idempotent=True))
+    except (BackendUnavailable, requests.exceptions.RequestException):
+        return None
+
+
+def pdf_filename(os_data):
+    return f"OS_{os_data.get('veiculo_placa', 'SEM_PLACA')}_{os_data['id'][:8]}.pdf"
+
+
+def render_os_pdf(os_data, session=None):
+    """Gera o relatório de uma OS em PDF, com fotos e assinaturas, e retorna os bytes."""
+    session = session or requests.Session()
+
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, _text(f"Relatório de Serviço - OS {os_data['id'][:8]}"), new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(2)
+
+    # Dados do cliente, veículo e serviço
+    campos = [
+        ("Cliente", os_data.get("cliente_nome")),
+        ("Endereço", os_data.get("cliente_endereco")),
+        ("Veículo", f"{os_data.get('veiculo_modelo', '')} - {os_data.get('veiculo_placa', '')}"),
+        ("Tipo de Veículo", (os_data.get("veiculo_tipo") or "").capitalize()),
+        ("Tipo de Serviço", os_data.get("servico_tipo")),
+        ("Técnico", os_data.get("tecnico_nome")),
+        ("ID do Rastreador", os_data.get("rastreador_id")),
+        ("Bloqueio Instalado", "Sim" if os_data.get("bloqueio_instalado") else "Não"),
+        ("Abertura", os_data.get("created_at")),
+        ("Finalização", os_data.get("data_finalizacao")),
+    ]
+    for label, value in campos:
+        pdf.set_font("Helvetica", "B", 10)
+        pdf.cell(45, 7, _text(label + ":"))
+        pdf.set_font("Helvetica", "", 10)
+        pdf.multi_cell(0, 7, _text(value), new_x="LMARGIN", new_y="NEXT")
+
+    # Checklist
+    checklist = parse_checklist(os_data.get("checklist_respostas"))
+    pdf.ln(3)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "Checklist", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 10)
+    if not checklist["total_itens"]:
+        pdf.cell(0, 6, _text("Nenhum item registrado."), new_x="LMARGIN", new_y="NEXT")
+    else:
+        pdf.cell(0, 6, _text(f"{checklist['intactos']} de {checklist['total_itens']} itens intactos."), new_x="LMARGIN", new_y="NEXT")
+    for item, nota in checklist["defeitos"].items():
+        pdf.multi_cell(0, 6, _text(f"- {item}: Defeito" + (f" ({nota})" if nota else "")), new_x="LMARGIN", new_y="NEXT")
+    for item, nota in checklist["notas"].items():
+        pdf.multi_cell(0, 6, _text(f"- {item}: Intacto ({nota})"), new_x="LMARGIN", new_y="NEXT")
+
+    pdf.ln(3)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, _text("Observações"), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 10)
+    pdf.multi_cell(0, 6, _text(os_data.get("observacoes") or "Nenhuma observação."), new_x="LMARGIN", new_y="NEXT")
+
+    # Fotos em grade 2x2
+    fotos = _load_json(os_data.get("fotos_urls"))
+    if fotos:
+        pdf.add_page()
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 8, _text("Registros Fotográficos"), new_x="LMARGIN", new_y="NEXT")
+        _draw_image_grid(pdf, session, fotos, FOTOS, cell_w=90, cell_h=70)
+
+    # Assinaturas lado a lado
+    assinaturas = _load_json(os_data.get("assinaturas_urls"))
+    if assinaturas:
+        pdf.ln(4)
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 8, "Assinaturas", new_x="LMARGIN", new_y="NEXT")
+        _draw_image_grid(pdf, session, assinaturas, ASSINATURAS, cell_w=90, cell_h=35)
+
+    return bytes(pdf.output())
+
+
+def _draw_image_grid(pdf, session, urls, labels, cell_w, cell_h):
+    """Desenha as imagens em duas colunas, com a legenda abaixo de cada uma."""
+    x_left = pdf.l_margin
+    for index, (key, caption) in enumerate(labels):
+        if index % 2 == 0:
+            if pdf.get_y() + cell_h + 10 > pdf.h - pdf.b_margin:
+                pdf.add_page()
+            row_y = pdf.get_y()
+        x = x_left + (index % 2) * (cell_w + 5)
+
+        image = _fetch_image(session, urls[key]) if urls.get(key) else None
+        if image is not None:
+            try:
+                pdf.image(image, x=x, y=row_y, w=cell_w, h=cell_h, keep_aspect_ratio=True)
+            except Exception:
+                image = None
+        if image is None:
+            pdf.rect(x, row_y, cell_w, cell_h)
+
+        pdf.set_xy(x, row_y + cell_h + 1)
+        pdf.set_font("Helvetica", "", 9)
+        pdf.cell(cell_w, 5, _text(caption), align="C")
+
+        if index % 2 == 1 or index == len(labels) - 1:
+            pdf.set_xy(x_left, row_y + cell_h + 8)
+
+
+# --- Exportação em Lote ---
+_worker_session = None
+
+
+def _worker_peak_mb():
+    """Pico de memória residente do próprio processo, em MB (None no Windows)."""
+    if resource is None:
+        return None
+    # No Linux ru_maxrss é reportado em KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _render_job(os_data):
+    """
+    Executado nos processos do pool; cada processo reaproveita a própria sessão HTTP.
+    Junto com o PDF devolve o pid e o pico de memória do processo até esta tarefa; como o
+    pool é criado para cada exportação, esse pico é o do processo durante a exportação.
+    """
+    global _worker_session
+    if _worker_session is None:
+        _worker_session = requests.Session()
+    content = render_os_pdf(os_data, _worker_session)
+    return pdf_filename(os_data), content, os.getpid(), _worker_peak_mb()
+
+
+def export_pdfs_to_zip(os_list, zip_file, max_workers=None, progress_callback=None):
+    """
+    Renderiza um PDF por OS em um pool de processos e grava cada um no ZIP assim que fica pronto.
+
+    `zip_file` deve ser um arquivo aberto em modo binário (de preferência em disco), de forma
+    que apenas os PDFs em processamento fiquem na memória, nunca o arquivo inteiro.
+    Retorna um dicionário com as métricas da exportação; `pico_memoria_worker_mb` é o maior
+    pico entre os processos do pool e `pico_memoria_workers_mb`, a soma dos picos de cada um.
+    """
+    max_workers = max_workers or min(4, multiprocessing.cpu_count())
+    max_in_flight = max_workers * 2
+    total = len(os_list)
+    done = 0
+    total_bytes = 0
+    falhas = []
+    worker_peaks = {}
+    start = time.perf_counter()
+
+    # 'spawn' evita fazer fork do servidor do Streamlit, que tem várias threads ativas
+    context = multiprocessing.get_context("spawn")
+    with zipfile.ZipFile(zip_file, "w", compression=zipfile.ZIP_DEFLATED) as archive, \
+            ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        pending = {}
+        queue = iter(os_list)
+
+        def submit_next():
+            os_data = next(queue, None)
+            if os_data is not None:
+                pending[executor.submit(_render_job, os_data)] = os_data
+
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                os_data = pending.pop(future)
+                try:
+                    filename, content, pid, peak_mb = future.result()
+                    archive.writestr(filename, content)
+                    if peak_mb is not None:
+                        worker_peaks[pid] = max(peak_mb, worker_peaks.get(pid, 0.0))
+                    total_bytes += len(content)
+                except Exception as e:
+                    falhas.append({"id": os_data["id"], "erro": str(e)})
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total)
+                submit_next()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "total": total,
+        "gerados": total - len(falhas),
+        "falhas": falhas,
+        "segundos": elapsed,
+        "pdfs_por_segundo": (total / elapsed) if elapsed else 0.0,
+        "mb_por_segundo": (total_bytes / 1024 / 1024 / elapsed) if elapsed else 0.0,
+        "bytes_pdf": total_bytes,
+        "pico_memoria_worker_mb": max(worker_peaks.values()) if worker_peaks else None,
+        "pico_memoria_workers_mb": sum(worker_peaks.values()) if worker_peaks else None,
+    }
+
+
+# --- Handler da Fila ---
+def pdf_job(params, ctx):
+    """Gera o ZIP de PDFs do período na fila de tarefas, fora da thread do script do Streamlit."""
+    filename = params["filename"]
+    path = ctx.artifact_path(filename)
+    with open(path, "wb") as zip_file:
+        stats = export_pdfs_to_zip(
+            params["os_list"],
+            zip_file,
+            progress_callback=lambda done, total: ctx.progress(done / total, f"Gerando PDFs... {done}/{total}")
+        )
+    return {"artifact_path": path, "filename": filename, "mime": "application/zip", "estatisticas": stats}
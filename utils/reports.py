@@ -0,0 +1,208 @@
+"""
+Geração de relatórios DOCX e envio dos arquivos do checklist ao Storage.
+
+As funções `*_job` são os handlers executados pela fila de tarefas (utils/jobs.py),
+fora da thread do script do Streamlit.
+"""
+import json
+import shutil
+import time
+from io import BytesIO
+
+from utils.checklist import expand_checklist
+from utils.resilience import BackendUnavailable, get_executor
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+IMAGE_TIMEOUT = 15  # segundos por imagem
+# Esperas entre as rodadas de envio quando o serviço está instável; somadas, passam do
+# tempo em que o disjuntor fica aberto (utils/resilience.py)
+UPLOAD_RETRY_DELAYS = [5, 20, 60]  # segundos
+
+
+# --- Relatórios ---
+def _download(url):
+    import requests
+
+    response = requests.get(url, timeout=IMAGE_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def get_image_from_url(url):
+    """Baixa a imagem com prazo e novas tentativas; retorna None se não for possível."""
+    import requests
+
+    try:
+        return BytesIO(get_executor().call("imagens", _download, url, idempotent=True))
+    except (BackendUnavailable, requests.exceptions.RequestException):
+        return None
+
+
+def docx_filename(os_data):
+    return f"OS_{os_data['veiculo_placa']}_{os_data['id'][:8]}.docx"
+
+
+def render_docx(os_data, template_items=None, template_path="template.docx"):
+    """
+    Gera um arquivo DOCX a partir de um template e dos dados da OS. `template_items`
+    completa os itens das OS esparsas que não guardaram a lista de itens verificados.
+    """
+    from docxtpl import DocxTemplate
+
+    doc = DocxTemplate(template_path)
+    context = os_data.copy()
+
+    # Checklist: 'Luzes de Freio' vira a tag 'Luzes_de_Freio'
+    checklist = expand_checklist(os_data.get('checklist_respostas'), template_items)
+    for item, status in checklist.items():
+        tag = item.replace(' ', '_').replace('-', '_')
+        context[tag] = status
+
+    # Imagens
+    if isinstance(os_data.get('fotos_urls'), str):
+        fotos = json.loads(os_data['fotos_urls'])
+        for key, url in fotos.items():
+            context[f'foto_{key}'] = get_image_from_url(url)
+
+    if isinstance(os_data.get('assinaturas_urls'), str):
+        assinaturas = json.loads(os_data['assinaturas_urls'])
+        for key, url in assinaturas.items():
+            context[f'assinatura_{key}'] = get_image_from_url(url)
+
+    doc.render(context)
+
+    file_stream = BytesIO()
+    doc.save(file_stream)
+    file_stream.seek(0)
+    return file_stream
+
+
+# --- Storage ---
+_client = None
+
+
+def get_worker_client():
+    """
+    Cliente Supabase dos processos da fila. Usa a service_key quando disponível, pois
+    a tarefa não tem a sessão do usuário logado que o RLS exigiria.
+    """
+    global _client
+    if _client is None:
+        import streamlit as st
+        from supabase import create_client
+        from utils.resilience import client_options
+
+        config = st.secrets["supabase"]
+        _client = create_client(config["url"], config.get("service_key") or config["key"], options=client_options())
+    return _client
+
+
+def upload_to_storage(client, bucket_name, file_bytes, destination_path, content_type="image/png"):
+    """
+    Faz upload de um arquivo para o Supabase Storage e retorna a URL pública. Com upsert o
+    envio é idempotente, então pode ser repetido após uma falha transitória.
+    """
+    get_executor().call(
+        "storage",
+        client.storage.from_(bucket_name).upload,
+        file=file_bytes,
+        path=destination_path,
+        file_options={"content-type": content_type, "upsert": "true"},
+        idempotent=True
+    )
+    return client.storage.from_(bucket_name).get_public_url(destination_path)
+
+
+# --- Handlers da Fila ---
+def docx_job(params, ctx):
+    os_data = params["os_data"]
+    ctx.progress(0.1, "Baixando imagens e montando o relatório...")
+    file_stream = render_docx(os_data, params.get("template_items"))
+    path = ctx.artifact_path(docx_filename(os_data))
+    with open(path, "wb") as f:
+        f.write(file_stream.getbuffer())
+    return {"artifact_path": path, "filename": docx_filename(os_data), "mime": DOCX_MIME}
+
+
+def _retry_unavailable(ctx, fraction, label, fn, *args, **kwargs):
+    """
+    Executa `fn` e, se o serviço estiver fora do ar (prazo, 5xx ou disjuntor aberto), tenta
+    de novo após UPLOAD_RETRY_DELAYS. Erros da própria requisição (ex.: 4xx) não são repetidos.
+    """
+    for delay in [*UPLOAD_RETRY_DELAYS, None]:
+        try:
+            return fn(*args, **kwargs)
+        except BackendUnavailable as e:
+            if delay is None:
+                raise
+            ctx.progress(fraction, f"Serviço instável ({e}); nova tentativa de {label} em {delay} s...")
+            time.sleep(delay)
+
+
+def _checklist_saved(client, os_id, new_status, user_id):
+    """Diz se a OS já está com o checklist gravado, por uma rodada cuja resposta se perdeu."""
+    query = client.table('ordens_de_servico').select('status, atualizado_por').eq('id', os_id)
+    rows = get_executor().call("supabase", query.execute, idempotent=True).data
+    return bool(rows) and rows[0]['status'] == new_status and rows[0].get('atualizado_por') == user_id
+
+
+def upload_checklist_job(params, ctx):
+    """
+    Envia as fotos e assinaturas (e suas miniaturas) deixadas em disco pelo checklist e,
+    ao final, grava as respostas e muda o status da OS para 'Aguardando Suporte'.
+
+    Pode ser executada de novo após uma falha (`JobQueue.retry`): os envios usam upsert e a
+    mudança de status é dada como feita se a OS já estiver 'Aguardando Suporte' pelo mesmo usuário.
+    Os arquivos em disco só são apagados quando tudo foi gravado.
+    """
+    from utils.thumbnails import make_thumbnail, thumbnail_path
+    from utils.transitions import EM_ANDAMENTO, transition_orders
+
+    client = get_worker_client()
+    urls = {"fotos": {}, "assinaturas": {}}
+    thumbs = {"fotos": {}, "assinaturas": {}}
+    falhas = []
+    files = params["files"]
+
+    for index, item in enumerate(files):
+        fraction = index / (len(files) + 1)
+        ctx.progress(fraction, f"Enviando {item['path']}...")
+        with open(item["spool_path"], "rb") as f:
+            file_bytes = f.read()
+        # Sem a foto ou a assinatura o checklist fica incompleto: a falha interrompe a tarefa
+        urls[item["group"]][item["key"]] = _retry_unavailable(
+            ctx, fraction, item["path"], upload_to_storage, client, item["bucket"], file_bytes, item["path"]
+        )
+        # Falhas na miniatura não bloqueiam o envio do checklist (scripts/backfill_thumbnails.py as gera depois)
+        try:
+            thumb_bytes, content_type = make_thumbnail(file_bytes, item["keep_transparency"])
+            thumbs[item["group"]][item["key"]] = upload_to_storage(
+                client, item["bucket"], thumb_bytes,
+                thumbnail_path(item["path"], item["keep_transparency"]), content_type
+            )
+        except Exception as e:
+            falhas.append(f"miniatura de {item['path']}: {e}")
+
+    fraction = len(files) / (len(files) + 1)
+    ctx.progress(fraction, "Salvando o checklist...")
+    update_data = dict(params["update_data"])
+    update_data.update({
+        "fotos_urls": json.dumps(urls["fotos"]),
+        "assinaturas_urls": json.dumps(urls["assinaturas"]),
+        "fotos_miniaturas_urls": json.dumps(thumbs["fotos"]),
+        "assinaturas_miniaturas_urls": json.dumps(thumbs["assinaturas"]),
+    })
+    new_status, user_id = update_data.pop("status"), update_data.pop("atualizado_por")
+    # Só grava se a OS ainda estiver em andamento (ver utils/transitions.py)
+    changed, _ = _retry_unavailable(
+        ctx, fraction, "gravação", transition_orders,
+        client, [params["os_id"]], EM_ANDAMENTO, new_status, user_id, **update_data
+    )
+    # Sem alteração pode ser uma rodada anterior que gravou mas cuja resposta se perdeu
+    if not changed and not _retry_unavailable(
+        ctx, fraction, "verificação", _checklist_saved, client, params["os_id"], new_status, user_id
+    ):
+        raise RuntimeError("A OS não está mais 'Em Andamento'; o checklist não foi gravado.")
+
+    shutil.rmtree(params["spool_dir"], ignore_errors=True)
+    return {"falhas": falhas}
@@ -0,0 +1,286 @@
+"""
+Chamadas ao Supabase (banco e Storage) e aos downloads de imagens com prazo, novas
+tentativas e disjuntor (circuit breaker).
+
+Todas as chamadas passam por um único `BackendExecutor` por processo:
+
+- cada chamada tem um prazo (deadline), contado a partir do momento em que ela começa a
+  rodar; se estourar, a sessão recebe um erro em vez de ficar presa esperando o backend;
+- com todas as threads ocupadas, a chamada espera por uma até QUEUE_TIMEOUT e depois é
+  recusada (BackendBusy); essa espera não conta no prazo nem para o disjuntor, pois não
+  diz nada sobre o backend;
+- leituras e operações idempotentes são repetidas com espera exponencial e jitter
+  quando a falha é transitória (timeout, conexão, erro 5xx);
+- falhas transitórias seguidas abrem o disjuntor do backend: as chamadas seguintes
+  falham na hora e as leituras passam a devolver o último resultado bom conhecido,
+  até que uma chamada de teste (meia-abertura) confirme que o backend voltou.
+
+Erros que não são transitórios (ex.: 4xx, RLS) são repassados sem nova tentativa e
+não contam para o disjuntor.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+logger = logging.getLogger(__name__)
+
+# Configuração por backend: prazo (s), tentativas extras, falhas até abrir e tempo aberto (s)
+BACKENDS = {
+    "supabase": {"timeout": 8.0, "retries": 2, "failure_threshold": 5, "reset_timeout": 30.0},
+    "storage": {"timeout": 30.0, "retries": 2, "failure_threshold": 5, "reset_timeout": 30.0},
+    "imagens": {"timeout": 15.0, "retries": 1, "failure_threshold": 10, "reset_timeout": 30.0},
+}
+BACKOFF_BASE = 0.2  # segundos
+BACKOFF_MAX = 2.0
+QUEUE_TIMEOUT = 5.0  # segundos esperando uma thread livre antes de recusar a chamada
+FALLBACK_ENTRIES = 512
+
+CLOSED, OPEN, HALF_OPEN = "fechado", "aberto", "meio-aberto"
+
+
+class BackendUnavailable(RuntimeError):
+    """O backend não respondeu a tempo ou está com o disjuntor aberto."""
+
+
+class DeadlineExceeded(BackendUnavailable):
+    pass
+
+
+class CircuitOpen(BackendUnavailable):
+    pass
+
+
+class BackendBusy(BackendUnavailable):
+    """Todas as threads do executor ocupadas: a chamada nem chegou ao backend."""
+
+
+def is_transient(exc):
+    """Falhas que valem nova tentativa: prazo, conexão e respostas 5xx."""
+    if isinstance(exc, (DeadlineExceeded, TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    try:
+        import requests
+        if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+            return True
+    except ImportError:
+        pass
+    # Status HTTP da resposta; no PostgREST, `code` traz o status ou o SQLSTATE do Postgres,
+    # cujas classes 5x (ex.: 57014, statement timeout) também são falhas do servidor
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status", None) or getattr(exc, "code", None)
+    return str(status or "").startswith("5")
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Diz se a chamada pode ir ao backend; na meia-abertura libera uma única chamada de teste."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.warning("Disjuntor '%s' fechado: backend respondeu novamente", self.name)
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def release(self):
+        """Devolve a chamada de teste da meia-abertura sem resultado (ela não chegou ao backend)."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning("Disjuntor '%s' aberto após %d falhas", self.name, self.failures)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+class BackendExecutor:
+    def __init__(self, backends=None, max_workers=32):
+        self.backends = backends or BACKENDS
+        self.breakers = {
+            name: CircuitBreaker(name, config["failure_threshold"], config["reset_timeout"])
+            for name, config in self.backends.items()
+        }
+        # As chamadas rodam em threads para que o prazo valha mesmo se o cliente HTTP travar
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backend-call")
+        self._fallback = OrderedDict()
+        self._fallback_lock = threading.Lock()
+        self.stats = {"chamadas": 0, "tentativas_extras": 0, "prazos_estourados": 0, "rejeitadas": 0, "fila_cheia": 0, "dados_salvos": 0}
+
+    def call(self, backend, fn, *args, timeout=None, retries=None, idempotent=False, **kwargs):
+        """
+        Executa `fn(*args, **kwargs)` com prazo e disjuntor. Só repete a chamada se
+        `idempotent=True`, para que uma escrita nunca seja aplicada duas vezes.
+        """
+        config = self.backends[backend]
+        breaker = self.breakers[backend]
+        timeout = config["timeout"] if timeout is None else timeout
+        retries = (config["retries"] if retries is None else retries) if idempotent else 0
+        self.stats["chamadas"] += 1
+
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                self.stats["rejeitadas"] += 1
+                raise CircuitOpen(f"Serviço '{backend}' indisponível no momento; tente novamente em instantes.")
+            started = threading.Event()
+            future = self._pool.submit(_with_context, started, get_script_run_ctx(suppress_warning=True), fn, args, kwargs)
+            # O prazo só começa quando a chamada sai da fila do pool e começa a rodar
+            if not started.wait(QUEUE_TIMEOUT) and future.cancel():
+                breaker.release()
+                self.stats["fila_cheia"] += 1
+                raise BackendBusy(f"Muitas chamadas simultâneas ao serviço '{backend}'; tente novamente em instantes.")
+            try:
+                result = future.result(timeout=timeout)
+            except FutureTimeout:
+                future.cancel()
+                self.stats["prazos_estourados"] += 1
+                error = DeadlineExceeded(f"Serviço '{backend}' não respondeu em {timeout:.0f} s.")
+            except Exception as e:
+                error = e
+            else:
+                breaker.record_success()
+                return result
+
+            if not is_transient(error):
+                # Erro da própria requisição (ex.: 4xx): o backend está respondendo
+                breaker.record_success()
+                raise error
+            breaker.record_failure()
+            if attempt == retries:
+                if isinstance(error, BackendUnavailable):
+                    raise error
+                raise BackendUnavailable(f"Falha ao acessar o serviço '{backend}': {error}") from error
+            self.stats["tentativas_extras"] += 1
+            # Espera exponencial com jitter completo, para as sessões não tentarem todas juntas
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+    def read(self, backend, key, fn, *args, **kwargs):
+        """
+        Leitura idempotente com reserva: guarda o último resultado bom de `key` e o devolve
+        (avisando o handler de `set_stale_handler`) quando o backend está fora do ar ou com o disjuntor aberto.
+        """
+        try:
+            result = self.call(backend, fn, *args, idempotent=True, **kwargs)
+        except BackendUnavailable as e:
+            with self._fallback_lock:
+                if key not in self._fallback:
+                    raise
+                result = self._fallback[key]
+            self.stats["dados_salvos"] += 1
+            if _stale_handler is not None:
+                _stale_handler(backend, e)
+            return result
+        with self._fallback_lock:
+            self._fallback[key] = result
+            self._fallback.move_to_end(key)
+            while len(self._fallback) > FALLBACK_ENTRIES:
+                self._fallback.popitem(last=False)
+        return result
+
+
+def _with_context(started, ctx, fn, args, kwargs):
+    started.set()
+    # Funções com st.cache_data/st.cache_resource precisam do contexto da sessão que chamou;
+    # fora do Streamlit (fila de tarefas, scripts) não há contexto a repassar
+    if ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+    return fn(*args, **kwargs)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_stale_handler = None
+
+
+def client_options():
+    """
+    Timeouts do próprio cliente HTTP do Supabase, um pouco acima dos prazos, para que as
+    threads de chamadas abandonadas por estouro de prazo também sejam liberadas.
+
+    Também desliga as novas tentativas internas do postgrest-py: ele repete sozinho os GETs
+    com resposta 503/520, dormindo 1 + 2 + 4 s dentro da chamada, o que estoura o prazo e
+    duplica as novas tentativas do executor, que já trata o 503 como falha transitória.
+    """
+    from postgrest import base_request_builder
+    from supabase import ClientOptions
+
+    base_request_builder.MAX_RETRIES = 0
+
+    return ClientOptions(
+        postgrest_client_timeout=BACKENDS["supabase"]["timeout"] + 2,
+        storage_client_timeout=int(BACKENDS["storage"]["timeout"]) + 5,
+    )
+
+
+def get_executor():
+    """Executor único do processo (servidor do Streamlit ou processo da fila de tarefas)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BackendExecutor()
+        return _executor
+
+
+def set_stale_handler(handler):
+    """Registra `handler(backend, erro)`, chamado sempre que uma leitura devolve dados salvos."""
+    global _stale_handler
+    _stale_handler = handler
+
+
+def resilient_read(backend="supabase"):
+    """
+    Decorador para funções de leitura: aplica prazo, novas tentativas e disjuntor e, com
+    o backend fora do ar, devolve o último resultado bom para os mesmos argumentos.
+
+    Fica acima do `@st.cache_data` (ou do `@shared_cache`): o cache só guarda resultados
+    novos, já que com o backend fora do ar a função em cache falha e o último resultado
+    bom é devolvido por aqui, sem passar pelo cache. O `.clear()` do cache é repassado.
+    """
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            return get_executor().read(backend, key, fn, *args, **kwargs)
+        if hasattr(fn, "clear"):
+            wrapper.clear = fn.clear
+        return wrapper
+    return decorator
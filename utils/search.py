@@ -0,0 +1,110 @@
+"""
+Busca de OS por placa, cliente, ID do rastreador e endereço, em todos os status.
+
+A busca do app usa a coluna gerada `busca_texto` do Supabase com índice trigram (pg_trgm),
+ver supabase/migrations. `LocalSearchIndex` reproduz a mesma semântica em SQLite FTS5
+com tokenizador trigram (cada termo precisa aparecer como substring) e é usado só em
+benchmarks/search_benchmark.py: o app não o alimenta nem o mantém atualizado.
+"""
+import sqlite3
+
+SEARCH_FIELDS = ["veiculo_placa", "cliente_nome", "rastreador_id", "cliente_endereco"]
+RESULT_COLUMNS = "id, status, veiculo_placa, veiculo_modelo, cliente_nome, cliente_endereco, rastreador_id, tecnico_nome, created_at"
+MIN_TERM_LENGTH = 3
+
+
+def normalize_query(text):
+    """Minúsculas e espaços colapsados, para que variações da mesma busca usem o mesmo cache."""
+    return " ".join((text or "").lower().split())
+
+
+def query_terms(normalized):
+    """Termos com tamanho suficiente para usar o índice trigram."""
+    return [term for term in normalized.split(" ") if len(term) >= MIN_TERM_LENGTH]
+
+
+def search_supabase(supabase, normalized, limit, offset):
+    """
+    Uma página de resultados do Supabase. Busca `limit + 1` linhas para saber se há
+    uma próxima página sem precisar de um count(*) sobre a tabela inteira.
+    """
+    # '%', '_' e '*' (que o PostgREST troca por '%') digitados pelo usuário não devem virar curingas
+    terms = [term.replace("%", "").replace("_", "").replace("*", "") for term in query_terms(normalized)]
+    terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    if not terms:
+        return [], False
+    query = supabase.table('ordens_de_servico').select(RESULT_COLUMNS)
+    for term in terms:
+        query = query.ilike('busca_texto', f"%{term}%")
+    response = query.order('created_at', desc=True).range(offset, offset + limit).execute()
+    rows = response.data or []
+    return rows[:limit], len(rows) > limit
+
+
+class LocalSearchIndex:
+    """Índice local em SQLite FTS5 (trigram), usado nos benchmarks."""
+
+    def __init__(self, path=":memory:"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ordens ("
+            " rowid INTEGER PRIMARY KEY, id TEXT UNIQUE, status TEXT, veiculo_placa TEXT, veiculo_modelo TEXT,"
+            " cliente_nome TEXT, cliente_endereco TEXT, rastreador_id TEXT, tecnico_nome TEXT, created_at TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ordens_created_at ON ordens (created_at)")
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS ordens_busca USING fts5("
+            + ", ".join(SEARCH_FIELDS) + ", content='ordens', content_rowid='rowid', tokenize='trigram')"
+        )
+
+    def add(self, rows):
+        """Insere (ou substitui) as OS no índice. `rows` é um iterável de dicionários."""
+        columns = [c.strip() for c in RESULT_COLUMNS.split(",")]
+        with self.conn:
+            for row in rows:
+                values = [row.get(c) for c in columns]
+                existing = self.conn.execute("SELECT rowid FROM ordens WHERE id = ?", (row["id"],)).fetchone()
+                if existing:
+                    # Mantém o rowid (e portanto a posição na ordenação) ao atualizar uma OS
+                    rowid = existing[0]
+                    self._delete_from_index(rowid)
+                    self.conn.execute(
+                        f"UPDATE ordens SET {', '.join(c + ' = ?' for c in columns)} WHERE rowid = ?",
+                        values + [rowid]
+                    )
+                else:
+                    rowid = self.conn.execute(
+                        f"INSERT INTO ordens ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        values
+                    ).lastrowid
+                self.conn.execute(
+                    f"INSERT INTO ordens_busca (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (?, ?, ?, ?, ?)",
+                    [rowid] + [row.get(f) or "" for f in SEARCH_FIELDS]
+                )
+
+    def _delete_from_index(self, rowid):
+        """Em tabelas FTS5 com content externo, a remoção precisa receber os valores antigos."""
+        old = self.conn.execute(f"SELECT {', '.join(SEARCH_FIELDS)} FROM ordens WHERE rowid = ?", (rowid,)).fetchone()
+        self.conn.execute(
+            f"INSERT INTO ordens_busca (ordens_busca, rowid, {', '.join(SEARCH_FIELDS)}) VALUES ('delete', ?, ?, ?, ?, ?)",
+            [rowid] + [value or "" for value in old]
+        )
+
+    def search(self, normalized, limit, offset):
+        terms = query_terms(normalized)
+        if not terms:
+            return [], False
+        # Cada termo entre aspas vira uma busca de substring; AND exige todos os termos
+        match = " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        # As OS entram no índice em ordem de criação, então rowid decrescente equivale a
+        # created_at decrescente e o FTS5 consegue parar na página pedida sem ordenar tudo
+        cursor = self.conn.execute(
+            f"SELECT {RESULT_COLUMNS} FROM ordens JOIN "
+            "(SELECT rowid AS match_rowid FROM ordens_busca WHERE ordens_busca MATCH ? "
+            " ORDER BY rowid DESC LIMIT ? OFFSET ?) ON ordens.rowid = match_rowid "
+            "ORDER BY match_rowid DESC",
+            (match, limit + 1, offset)
+        )
+        names = [d[0] for d in cursor.description]
+        rows = [dict(zip(names, values)) for values in cursor.fetchall()]
+        return rows[:limit], len(rows) > limit
@@ -0,0 +1,95 @@
+"""
+Memória ocupada por sessão: buffers de upload (câmera) e valores do session_state.
+
+Os arquivos da câmera ficam na memória do servidor (gerenciador de uploads do Streamlit)
+até o fim da sessão; `spill_upload` os grava em disco e os remove com `release_upload`.
+`session_memory_report` estima quanto uma sessão ocupa, para dimensionar o servidor
+pelo número de técnicos simultâneos.
+"""
+import logging
+import sys
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+logger = logging.getLogger(__name__)
+
+MAX_DEPTH = 6
+
+
+def release_upload(uploaded_file):
+    """Remove do gerenciador de uploads um arquivo da sessão atual (já copiado para o disco)."""
+    ctx = get_script_run_ctx()
+    if ctx is not None and uploaded_file is not None:
+        ctx.uploaded_file_mgr.remove_file(ctx.session_id, uploaded_file.file_id)
+
+
+def spill_upload(uploaded_file, path):
+    """Grava em disco um arquivo enviado pela sessão e o tira da memória do servidor."""
+    # getvalue() devolve os próprios bytes do upload; getbuffer() faria uma cópia deles no BytesIO
+    with open(path, "wb") as f:
+        f.write(uploaded_file.getvalue())
+    release_upload(uploaded_file)
+
+
+def _uploads_in_memory(ctx):
+    """Bytes dos uploads da sessão ainda na memória (o gerenciador padrão guarda tudo em RAM)."""
+    storage = getattr(ctx.uploaded_file_mgr, "file_storage", {}).get(ctx.session_id, {})
+    return sum(len(record.data) for record in storage.values()), len(storage)
+
+
+def estimate_size(value, seen=None, depth=0):
+    """Tamanho aproximado em bytes de um valor e do que ele referencia (arrays, bytes, coleções)."""
+    seen = set() if seen is None else seen
+    if id(value) in seen or depth > MAX_DEPTH:
+        return 0
+    seen.add(id(value))
+
+    nbytes = getattr(value, "nbytes", None)  # arrays do numpy
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    size = sys.getsizeof(value, 0)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, seen, depth + 1) + estimate_size(v, seen, depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen, depth + 1) for item in value)
+    elif hasattr(value, "file_id"):
+        pass  # UploadedFile: os bytes são os do gerenciador de uploads, contados à parte
+    elif hasattr(value, "getbuffer"):  # BytesIO
+        size += value.getbuffer().nbytes
+    elif hasattr(value, "__dict__") and not isinstance(value, type):  # ex.: resultado do canvas
+        size += estimate_size(vars(value), seen, depth + 1)
+    return size
+
+
+def session_memory_report():
+    """
+    Retorna {"total_bytes", "uploads_bytes", "uploads", "chaves": {chave: bytes}} da sessão atual:
+    os uploads guardados pelo Streamlit mais o que está em cada chave do session_state.
+    """
+    ctx = get_script_run_ctx()
+    uploads_bytes, uploads = _uploads_in_memory(ctx) if ctx is not None else (0, 0)
+    keys = {}
+    for key in list(st.session_state.keys()):
+        try:
+            value = st.session_state[key]
+        except Exception:
+            continue
+        keys[str(key)] = estimate_size(value)
+    return {
+        "total_bytes": sum(keys.values()) + uploads_bytes,
+        "uploads_bytes": uploads_bytes,
+        "uploads": uploads,
+        "chaves": dict(sorted(keys.items(), key=lambda item: -item[1])),
+    }
+
+
+def log_session_memory(page):
+    report = session_memory_report()
+    logger.info(
+        "%s: sessão ocupa ~%.0f KB (uploads em memória: %d, %.0f KB)",
+        page, report["total_bytes"] / 1024, report["uploads"], report["uploads_bytes"] / 1024
+    )
+    return report
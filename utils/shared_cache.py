@@ -0,0 +1,181 @@
+"""
+Cache compartilhado entre as réplicas do app (e com os processos da fila de tarefas).
+
+`st.cache_data` guarda os resultados na memória de cada processo: com várias réplicas
+atrás do balanceador, cada uma consulta o Supabase por conta própria e a limpeza feita
+em uma (`.clear()`) não chega às outras. O decorador `shared_cache` guarda o resultado
+em um backend comum, configurado em [cache] nos segredos:
+
+    [cache]
+    backend = "sqlite"                  # réplicas na mesma máquina/volume (padrão)
+    path = ".cache/compartilhado.sqlite3"
+    # backend = "redis"                 # réplicas em máquinas diferentes
+    # url = "redis://localhost:6379/0"
+
+Os valores são serializados em JSON e expiram pelo TTL. Só servem valores que voltam
+iguais do JSON: chaves de dicionário que não são texto voltam como texto (ex.: {1: "a"}
+vira {"1": "a"}) e tuplas voltam como listas; valores com chaves não textuais são
+recusados pelo decorador (TypeError). A invalidação usa uma versão
+por namespace: `invalidate()` incrementa a versão no backend e todas as réplicas passam
+a ignorar as entradas antigas, que expiram sozinhas. Se o backend falhar, a função
+original é chamada diretamente.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Namespaces usados pelo app. TECNICOS é invalidado pelo Admin ao criar, editar, ativar ou
+# desativar usuários; os templates são editados direto no banco e valem pelo TTL de
+# get_all_checklist_templates (utils/bootstrap.py)
+TECNICOS = "tecnicos"
+TEMPLATES_CHECKLIST = "templates_checklist"
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS versoes (namespace TEXT PRIMARY KEY, versao INTEGER NOT NULL);
+"""
+PURGE_EVERY = 500  # gravações entre limpezas das entradas expiradas no SQLite
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().executescript(SQLITE_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def version(self, namespace):
+        row = self._conn().execute("SELECT versao FROM versoes WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, namespace):
+        self._conn().execute(
+            "INSERT INTO versoes (namespace, versao) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET versao = versao + 1",
+            (namespace,)
+        )
+
+
+class RedisBackend:
+    """Qualquer servidor compatível com Redis (Redis, Valkey, KeyDB...). Requer o pacote `redis`."""
+
+    def __init__(self, url, prefix="checklist:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def version(self, namespace):
+        return int(self.client.get(f"{self.prefix}versao:{namespace}") or 0)
+
+    def bump(self, namespace):
+        self.client.incr(f"{self.prefix}versao:{namespace}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Backend do processo, criado na primeira chamada a partir de [cache] nos segredos."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            import streamlit as st
+
+            config = st.secrets.get("cache", {})
+            if config.get("backend") == "redis":
+                _backend = RedisBackend(config["url"])
+            else:
+                _backend = SQLiteBackend(config.get("path", os.path.join(".cache", "compartilhado.sqlite3")))
+        return _backend
+
+
+def _key(namespace, version, args, kwargs):
+    payload = json.dumps([args, sorted(kwargs.items())], default=repr, sort_keys=True)
+    return f"{namespace}:v{version}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+def _has_non_text_keys(value):
+    if isinstance(value, dict):
+        return any(not isinstance(k, str) or _has_non_text_keys(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_text_keys(item) for item in value)
+    return False
+
+
+def invalidate(namespace):
+    """Descarta, em todas as réplicas, os resultados em cache do namespace."""
+    try:
+        get_backend().bump(namespace)
+    except Exception:
+        logger.exception("Falha ao invalidar o cache compartilhado '%s'", namespace)
+
+
+def shared_cache(namespace, ttl):
+    """
+    Substitui `@st.cache_data(ttl=...)`: o resultado (serializável em JSON) fica no backend
+    compartilhado por `ttl` segundos. `funcao.clear()` invalida o namespace em todas as réplicas.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                backend = get_backend()
+                key = _key(namespace, backend.version(namespace), args, kwargs)
+                cached = backend.get(key)
+            except Exception:
+                logger.exception("Cache compartilhado indisponível; consultando direto")
+                return fn(*args, **kwargs)
+            if cached is not None:
+                return json.loads(cached)
+
+            value = fn(*args, **kwargs)
+            if _has_non_text_keys(value):
+                # Voltariam do cache com as chaves como texto, diferente da primeira chamada
+                raise TypeError(f"shared_cache('{namespace}'): {fn.__qualname__} retornou um dicionário com chaves que não são texto")
+            try:
+                backend.set(key, json.dumps(value), ttl)
+            except Exception:
+                logger.exception("Falha ao gravar no cache compartilhado '%s'", namespace)
+            return value
+
+        wrapper.clear = lambda: invalidate(namespace)
+        return wrapper
+    return decorator
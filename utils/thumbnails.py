@@ -0,0 +1,34 @@
+import io
+import posixpath
+
+from PIL import Image, ImageOps
+
+# Tamanho máximo (largura, altura) das miniaturas exibidas na fila do suporte
+THUMB_SIZE = (320, 240)
+JPEG_QUALITY = 70
+
+
+def make_thumbnail(image_bytes, keep_transparency=False, size=THUMB_SIZE):
+    """
+    Gera uma miniatura a partir dos bytes de uma imagem e retorna (bytes, content_type).
+
+    Fotos viram JPEG; assinaturas (keep_transparency=True) continuam PNG para manter o fundo transparente.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        # Respeita a orientação EXIF das fotos tiradas pelo celular
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        if keep_transparency:
+            img.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), "image/png"
+        img.convert("RGB").save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        return buffer.getvalue(), "image/jpeg"
+
+
+def thumbnail_path(destination_path, keep_transparency=False):
+    """'<os_id>/placa.png' -> '<os_id>/thumbs/placa.jpg'"""
+    folder, filename = posixpath.split(destination_path)
+    name = posixpath.splitext(filename)[0]
+    extension = "png" if keep_transparency else "jpg"
+    return posixpath.join(folder, "thumbs", f"{name}.{extension}")
@@ -0,0 +1,118 @@
+"""
+Mudanças de status das OS e percentis de tempo em cada status.
+
+O histórico de transições e o agregado diário são mantidos por triggers no banco
+(supabase/migrations/20261019000300_historico_status.sql); aqui ficam o formato
+das atualizações feitas pelo app e a leitura dos histogramas do agregado.
+"""
+from utils.resilience import get_executor
+
+PENDENTE = "Pendente"
+EM_ANDAMENTO = "Em Andamento"
+AGUARDANDO_SUPORTE = "Aguardando Suporte"
+FINALIZADA = "Finalizada"
+
+SEM_USUARIO = "00000000-0000-0000-0000-000000000000"
+
+# Limites superiores (em segundos) das faixas do histograma: 1 min, 5 min, 15 min, 30 min,
+# 1 h, 2 h, 4 h, 8 h, 1 dia, 2 dias, 4 dias, 7 dias, 14 dias; a última faixa é aberta.
+# Precisa ser igual ao array `limites` de acumular_tempo_status() no banco.
+HISTOGRAM_BOUNDS = [60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400, 172800, 345600, 604800, 1209600]
+
+
+def status_update(new_status, user_id, **fields):
+    """Campos de uma mudança de status; `atualizado_por` identifica o autor no histórico."""
+    return {"status": new_status, "atualizado_por": user_id, **fields}
+
+
+def transition_orders(supabase, os_ids, expected_status, new_status, user_id, **fields):
+    """
+    Muda o status de várias OS em uma única requisição, mas só das que ainda estão em
+    `expected_status` (compare-and-set): o filtro de status faz parte do próprio UPDATE,
+    então se dois usuários agirem ao mesmo tempo apenas o primeiro altera cada OS.
+
+    Retorna (alteradas, conflitos), listas de ids.
+    """
+    os_ids = list(dict.fromkeys(os_ids))
+    if not os_ids:
+        return [], []
+    query = supabase.table('ordens_de_servico') \
+        .update(status_update(new_status, user_id, **fields)) \
+        .in_('id', os_ids) \
+        .eq('status', expected_status)
+    # Sem novas tentativas: se a primeira tivesse sido aplicada, a repetição voltaria como conflito
+    response = get_executor().call("supabase", query.execute)
+    changed = {row['id'] for row in response.data or []}
+    if changed:
+        from utils.live_orders import publish_change
+
+        publish_change(changed)
+    return [i for i in os_ids if i in changed], [i for i in os_ids if i not in changed]
+
+
+def merge_histograms(histograms):
+    merged = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    for histogram in histograms:
+        for index, count in enumerate(histogram):
+            merged[index] += count
+    return merged
+
+
+def percentile_from_histogram(histogram, pct):
+    """
+    Percentil aproximado (em segundos), interpolando linearmente dentro da faixa.
+    Na última faixa, que não tem limite superior, retorna o limite inferior.
+    """
+    total = sum(histogram)
+    if total == 0:
+        return None
+    target = total * pct / 100
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        if count and cumulative + count >= target:
+            lower = HISTOGRAM_BOUNDS[index - 1] if index > 0 else 0
+            if index >= len(HISTOGRAM_BOUNDS):
+                return lower
+            upper = HISTOGRAM_BOUNDS[index]
+            return lower + (upper - lower) * (target - cumulative) / count
+        cumulative += count
+    return HISTOGRAM_BOUNDS[-1]
+
+
+def summarize_rollups(rows, group_by):
+    """
+    Agrupa as linhas de os_tempo_status_diario por `group_by` (tupla de colunas) e retorna,
+    por grupo, quantidade, média e p50/p90/p95 em segundos.
+    """
+    groups = {}
+    for row in rows:
+        key = tuple(row[column] for column in group_by)
+        group = groups.setdefault(key, {"quantidade": 0, "total_segundos": 0.0, "histogramas": []})
+        group["quantidade"] += row["quantidade"]
+        group["total_segundos"] += row["total_segundos"]
+        group["histogramas"].append(row["histograma"])
+
+    summary = {}
+    for key, group in groups.items():
+        histogram = merge_histograms(group["histogramas"])
+        summary[key] = {
+            "quantidade": group["quantidade"],
+            "media": group["total_segundos"] / group["quantidade"] if group["quantidade"] else None,
+            "p50": percentile_from_histogram(histogram, 50),
+            "p90": percentile_from_histogram(histogram, 90),
+            "p95": percentile_from_histogram(histogram, 95),
+        }
+    return summary
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} min"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes:02d}min"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h"